@@ -6,7 +6,10 @@ from sqlalchemy.orm import sessionmaker
 import datetime
 
 
-from app.core.config import MYSQL_DB_URL
+from app.core.config import (
+    MYSQL_DB_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+)
+from app.db.pool import TimedQueuePool
 
 
 from app.core.logger import get_logger
@@ -14,8 +17,17 @@ from app.core.logger import get_logger
 logger = get_logger(__name__)
 
 
-# Initialize engine with pymysql driver
-engine = create_engine(MYSQL_DB_URL.replace('mysql://', 'mysql+pymysql://'))
+# Initialize engine with pymysql driver. Its pool also serves raw connections from
+# app.db.session.get_db_connection
+engine = create_engine(
+    MYSQL_DB_URL.replace('mysql://', 'mysql+pymysql://'),
+    poolclass=TimedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING
+)
 metadata = MetaData()
 
 # Define tables
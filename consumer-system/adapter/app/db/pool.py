@@ -0,0 +1,65 @@
+"""
+Connection pool shared by SQLAlchemy Core and raw pymysql cursors.
+
+``TimedQueuePool`` is a ``QueuePool`` that records how long every checkout waited for a
+connection, including opening a new one, and how many checkouts timed out. Use
+``pool_stats`` to size DB_POOL_SIZE/DB_MAX_OVERFLOW for the number of concurrent workers.
+"""
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that keeps checkout wait-time statistics.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            timed_out = True
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.timeouts += timed_out
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def stats(self):
+        with self._stats_lock:
+            checkouts, timeouts = self.checkouts, self.timeouts
+            wait_total, wait_max = self.wait_total, self.wait_max
+        return {
+            "size": self.size(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "checkouts": checkouts,
+            "timeouts": timeouts,
+            "wait_mean_ms": round(wait_total / checkouts * 1000, 2) if checkouts else 0.0,
+            "wait_max_ms": round(wait_max * 1000, 2)
+        }
+
+
+def pool_stats(engine):
+    """
+    Checkout statistics of ``engine``'s pool, or its status line for other pool classes.
+    """
+    if isinstance(engine.pool, TimedQueuePool):
+        return engine.pool.stats()
+    return {"status": engine.pool.status()}
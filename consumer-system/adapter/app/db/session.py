@@ -1,23 +1,63 @@
 """
 Database utility functions for the Old Pension Adapter.
 """
+import contextlib
+
 import pymysql
-from app.core.config import DB_CONFIG
+
+from app.db.models import engine
+
+
+class PooledConnection:
+    """
+    Raw pymysql connection checked out from the shared engine pool. Cursors are
+    DictCursors unless another cursor class is passed, and ``close`` returns the
+    connection to the pool instead of disconnecting.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+
+    def cursor(self, cursorclass=pymysql.cursors.DictCursor):
+        return self._connection.cursor(cursorclass)
+
+    def close(self):
+        self._connection.close()
+
+    def invalidate(self, exception=None):
+        """
+        Discard the underlying connection instead of returning it to the pool, e.g.
+        after an error left it mid-result or in an unknown transaction state.
+        """
+        self._connection.invalidate(exception)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
 
 def get_db_connection():
     """
     Get a database connection to the Old Pension System.
-    Returns a PyMySQL connection.
+    Returns a PyMySQL connection from the shared pool; close it to give it back.
     """
     try:
-        connection = pymysql.connect(
-            host=DB_CONFIG['host'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password'],
-            db=DB_CONFIG['db'],
-            cursorclass=pymysql.cursors.DictCursor
-        )
-        return connection
+        return PooledConnection(engine.raw_connection())
     except Exception as e:
         print(f"Database connection error: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+
+@contextlib.contextmanager
+def db_connection():
+    """
+    Pooled connection for a ``with`` block. It is given back to the pool on exit, or
+    invalidated first if the block raised.
+    """
+    connection = get_db_connection()
+    try:
+        yield connection
+    except BaseException as e:
+        connection.invalidate(e)
+        raise
+    finally:
+        connection.close()
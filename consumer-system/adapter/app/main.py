@@ -6,6 +6,7 @@ from app.api.routes import api_router
 from app.core.config import PROJECT_NAME, PROJECT_DESCRIPTION, VERSION
 from app.tasks.batch_processor import start_scheduler
 from app.db.models import metadata, engine
+from app.db.pool import pool_stats
 from sqlalchemy.exc import OperationalError
 import pika
 import time
@@ -35,13 +36,22 @@ async def root():
         "version": VERSION
     }
 
+@app.get("/consumer/metrics", tags=["status"])
+async def metrics():
+    """
+    Database pool checkout statistics of this process
+    """
+    return {"db_pool": pool_stats(engine)}
+
 # Ensure MySQL and RabbitMQ are started before the service starts
 @app.on_event("startup")
 def check_dependencies():
     # Check MySQL connection
     while True:
         try:
-            engine.connect()
+            # Give the probe connection back to the pool
+            with engine.connect():
+                pass
             print("MySQL is up and running.")
             break
         except OperationalError:
@@ -12,7 +12,7 @@ import logging
 
 from sqlalchemy import select, update
 
-from app.core.config import API_KEY, PROVIDER_SERVICE_URL
+from app.core.config import API_KEY, PROVIDER_SERVICE_URL, RESULT_FORMAT
 from app.db.models import (
     SessionLocal, 
     batch_tracker, 
@@ -22,6 +22,7 @@ from app.db.models import (
 
 # app/utils/mask.py
 from app.utils.mask import mask_id_with_hash
+from app.utils.wire_format import JSON_FORMAT, MEDIA_TYPES, decode_part, format_available, format_for_media_type
 
 # app/utils/crypto_handler.py
 from app.utils.key_manager import KeyManager
@@ -35,6 +36,13 @@ encryptor = Encryptor(key_manager)
 
 logger = logging.getLogger(__name__)
 
+# Only ask the provider for a format this consumer can decode
+if format_available(RESULT_FORMAT):
+    ACCEPT_FORMAT = RESULT_FORMAT
+else:
+    logger.warning(f"RESULT_FORMAT '{RESULT_FORMAT}' is not available here, requesting JSON parts")
+    ACCEPT_FORMAT = JSON_FORMAT
+
 async def send_request_to_provider_service(request_data ,request:Request):
     """
     Sends a request to the Provider system's /provider/request endpoint
@@ -83,6 +91,17 @@ async def send_request_to_provider_service(request_data ,request:Request):
                         "status": "queued"
                     }
                 }
+            elif response.status_code == 429:
+                # The provider is rate limiting or saturated; the request was not queued
+                retry_after = response.headers.get("Retry-After")
+                logger.warning(f"Provider Service is busy, retry after {retry_after}s: {response.text}")
+                return {
+                    "header": {
+                        "status": "throttled",
+                        "retry_after": int(retry_after) if retry_after and retry_after.isdigit() else None,
+                        "message": response.json().get("detail", response.text)
+                    }
+                }
             else:
                 logger.error(f"Error sending request to Provider Service: {response.text}")
                 return {
@@ -144,37 +163,56 @@ async def poll_provider_service_results(request_id: str , request:Request):
             body = resp.json()["body"]
             state = body["status"]
 
-        if state == "failed":
+        # A "failed" provider request is retried by the provider; only dead letters are final
+        if state == "dead_letter":
             _update_status(request_id, "failed")
             return
         elif state != "completed":
             _update_status(request_id, "processing")
             return
 
+        # 3) For each new part, one status page of files at a time
         files = body["files"]
+        next_offset = body.get("next_offset")
+        while True:
+            for file_path in files:
+                part = int(file_path.rsplit("/", 1)[-1].split(".")[0])
+                # skip fully done parts
+                if part < last_part or (part == last_part and last_index == -1 and last_part != 0):
+                    continue
+
+                # 4) Fetch this part in the preferred wire format, JSON as fallback
+                async with httpx.AsyncClient() as client:
+                    part_resp = await client.get(
+                        f"{PROVIDER_SERVICE_URL}/results/{request_id}/{part}.json",
+                        headers={"X-API-Key": API_KEY,"Authorization": f"Bearer {token}",
+                                 "Accept": f"{MEDIA_TYPES[ACCEPT_FORMAT]}, application/json;q=0.5"},
+                        timeout=30.0
+                    )
+                    part_resp.raise_for_status()
+                    wire_format = format_for_media_type(part_resp.headers.get("content-type", "")) or JSON_FORMAT
+                    data = decode_part(part_resp.content, wire_format)
+
+                # 5) Process part with one session
+                _process_one_part(request_id, part, data, last_part, last_index)
+
+                # after successful part
+                last_part, last_index = part, -1  # reset last_index for next part
 
-        # 3) For each new part
-        for file_path in files:
-            part = int(file_path.rsplit("/", 1)[-1].split(".")[0])
-            # skip fully done parts
-            if part < last_part or (part == last_part and last_index == -1 and last_part != 0):
-                continue
+            if next_offset is None:
+                break
 
-            # 4) Fetch JSON for this part
             async with httpx.AsyncClient() as client:
-                part_resp = await client.get(
-                    f"{PROVIDER_SERVICE_URL}/results/{request_id}/{part}.json",
+                resp = await client.get(
+                    f"{PROVIDER_SERVICE_URL}/request/status/{request_id}",
+                    params={"offset": next_offset},
                     headers={"X-API-Key": API_KEY,"Authorization": f"Bearer {token}"},
-                    timeout=30.0
+                    timeout=10.0
                 )
-                part_resp.raise_for_status()
-                data = part_resp.json()
-
-            # 5) Process part with one session
-            _process_one_part(request_id, part, data, last_part, last_index)
-
-            # after successful part
-            last_part, last_index = part, -1  # reset last_index for next part
+                resp.raise_for_status()
+                body = resp.json()["body"]
+            files = body["files"]
+            next_offset = body.get("next_offset")
 
         # 6) All parts done
         _update_status(request_id, "completed")
@@ -222,7 +260,8 @@ def _process_one_part(request_id, part, data, last_part, last_index):
             if request_type == "verify":
                 criteria_results = item.get("criteria_results", {})
                 encrypted_data = encryptor.encrypt(criteria_results)
-                masked_aadhar = mask_id_with_hash(item.get("aadhar", ""))
+                # Demographic verify results have no aadhar
+                masked_aadhar = mask_id_with_hash(item.get("aadhar") or "")
                 batch.append({
                     "request_id":      request_id,
                     "aadhar":          masked_aadhar,
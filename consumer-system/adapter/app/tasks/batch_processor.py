@@ -10,7 +10,7 @@ import logging
 from sqlalchemy import select
 
 from app.db.models import SessionLocal, batch_tracker
-from app.db.session import get_db_connection
+from app.db.session import db_connection
 from app.services.data_exchange_service import send_request_to_provider_service
 from app.core.config import BATCH_SIZE, SCHEDULER_TIME
 
@@ -76,15 +76,12 @@ def batch_process_citizens():
         session.close()
         
         # Connect to the database
-        connection = get_db_connection()
-        
-        with connection.cursor() as cursor:
-            # In a real implementation, you'd execute the actual query
-            # This is just a sample for the example
-            cursor.execute("SELECT 1 as aadhar, 'John Doe' as name, 65 as age, 'male' as gender, 'X' as caste, 'CityA' as location UNION SELECT 2, 'Jane Smith', 70, 'female', 'Y', 'CityB'")
-            citizens = cursor.fetchall()
-        
-        connection.close()
+        with db_connection() as connection:
+            with connection.cursor() as cursor:
+                # In a real implementation, you'd execute the actual query
+                # This is just a sample for the example
+                cursor.execute("SELECT 1 as aadhar, 'John Doe' as name, 65 as age, 'male' as gender, 'X' as caste, 'CityA' as location UNION SELECT 2, 'Jane Smith', 70, 'female', 'Y', 'CityB'")
+                citizens = cursor.fetchall()
         
         if citizens:
             # Prepare verification request
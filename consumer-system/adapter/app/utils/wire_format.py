@@ -0,0 +1,187 @@
+"""
+Wire formats for result parts served by the Provider results route.
+
+A part is a ``{"header": {...}, "body": {<rows_key>: [row, ...]}}`` document. It can be
+sent as JSON (the default), as row-oriented MessagePack, or as a columnar Arrow IPC
+stream whose schema metadata carries the part header and the name of the rows key.
+The binary formats need the ``msgpack`` and ``pyarrow`` packages respectively.
+
+Arrow columns are the union of all row keys. The metadata records which rows lack a key,
+so decoding restores the original row shapes instead of filling them with nulls. A key
+whose values do not share one Arrow type (e.g. ``60`` next to ``"61"``) is sent as a
+column of JSON texts and parsed back on decode, so values keep their original types.
+"""
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+JSON_FORMAT = "json"
+MSGPACK_FORMAT = "msgpack"
+ARROW_FORMAT = "arrow"
+
+MEDIA_TYPES = {
+    JSON_FORMAT: "application/json",
+    MSGPACK_FORMAT: "application/msgpack",
+    ARROW_FORMAT: "application/vnd.apache.arrow.stream",
+}
+MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": MSGPACK_FORMAT,
+    "application/vnd.msgpack": MSGPACK_FORMAT,
+}
+SUPPORTED_FORMATS = tuple(MEDIA_TYPES)
+
+
+class UnsupportedFormatError(ValueError):
+    """Raised when a wire format is unknown or its package is not installed."""
+
+
+def format_available(wire_format):
+    if wire_format == MSGPACK_FORMAT:
+        return msgpack is not None
+    if wire_format == ARROW_FORMAT:
+        return pyarrow is not None
+    return wire_format == JSON_FORMAT
+
+
+def format_for_media_type(media_type):
+    """
+    Map a media type (parameters ignored) to a wire format, or None if it is not one of ours.
+    """
+    media_type = media_type.split(";")[0].strip().lower()
+    for wire_format, known in MEDIA_TYPES.items():
+        if media_type == known:
+            return wire_format
+    return MEDIA_TYPE_ALIASES.get(media_type)
+
+
+def negotiate_format(accept, default=JSON_FORMAT):
+    """
+    Pick the wire format from an Accept header by quality value. Falls back to ``default``
+    (or JSON, if ``default`` is not available) when the header is missing, is a wildcard,
+    or names no available format.
+    """
+    candidates = []
+    for position, entry in enumerate((accept or "").split(",")):
+        media_type, _, params = entry.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        wire_format = format_for_media_type(media_type)
+        if wire_format and quality > 0 and format_available(wire_format):
+            candidates.append((-quality, position, wire_format))
+
+    if candidates:
+        return min(candidates)[2]
+    return default if format_available(default) else JSON_FORMAT
+
+
+def _rows_key(document):
+    body = document.get("body", {})
+    for key, value in body.items():
+        if isinstance(value, list):
+            return key
+    return None
+
+
+def _arrow_column(values):
+    """
+    Arrow array for one column, or None when its values do not share one Arrow type.
+    """
+    try:
+        return pyarrow.array(values)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        return None
+
+
+def _arrow_table(rows):
+    """
+    Columnar table of ``rows`` plus the metadata needed to restore them exactly.
+    """
+    keys = list(dict.fromkeys(key for row in rows for key in row))
+    columns = {}
+    absent = {}
+    json_keys = []
+    for key in keys:
+        missing = [index for index, row in enumerate(rows) if key not in row]
+        if missing:
+            absent[key] = missing
+        values = [row.get(key) for row in rows]
+        column = _arrow_column(values)
+        if column is None:
+            json_keys.append(key)
+            column = pyarrow.array([json.dumps(value) if value is not None else None for value in values], pyarrow.string())
+        columns[key] = column
+    return pyarrow.table(columns), {"absent": json.dumps(absent), "json_keys": json.dumps(json_keys)}
+
+
+def _arrow_rows(table, metadata):
+    rows = table.to_pylist()
+    for key in json.loads(metadata.get(b"json_keys", b"[]")):
+        for row in rows:
+            if row[key] is not None:
+                row[key] = json.loads(row[key])
+    for key, missing in json.loads(metadata.get(b"absent", b"{}")).items():
+        for index in missing:
+            del rows[index][key]
+    return rows
+
+
+def encode_part(document, wire_format):
+    """
+    Serialize a part document into ``wire_format``. Returns bytes.
+    """
+    if not format_available(wire_format):
+        raise UnsupportedFormatError(f"Wire format '{wire_format}' is not available")
+
+    if wire_format == MSGPACK_FORMAT:
+        return msgpack.packb(document, use_bin_type=True)
+    if wire_format == ARROW_FORMAT:
+        rows_key = _rows_key(document)
+        rows = document["body"][rows_key] if rows_key else []
+        # Rows of one part can carry different keys (verify mixes aadhar and demographic
+        # results), so the columns are the union of all keys rather than the first row's
+        table, row_metadata = _arrow_table(rows)
+        table = table.replace_schema_metadata({
+            "header": json.dumps(document.get("header", {})),
+            "rows_key": rows_key or "",
+            **row_metadata,
+        })
+        sink = pyarrow.BufferOutputStream()
+        with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+    return json.dumps(document).encode("utf-8")
+
+
+def decode_part(content, wire_format):
+    """
+    Parse bytes in ``wire_format`` back into a part document.
+    """
+    if not format_available(wire_format):
+        raise UnsupportedFormatError(f"Wire format '{wire_format}' is not available")
+
+    if wire_format == MSGPACK_FORMAT:
+        return msgpack.unpackb(content, raw=False)
+    if wire_format == ARROW_FORMAT:
+        table = pyarrow.ipc.open_stream(content).read_all()
+        metadata = table.schema.metadata or {}
+        document = {"header": json.loads(metadata.get(b"header", b"{}")), "body": {}}
+        rows_key = metadata.get(b"rows_key", b"").decode("utf-8")
+        if rows_key:
+            document["body"][rows_key] = _arrow_rows(table, metadata)
+        return document
+    return json.loads(content)
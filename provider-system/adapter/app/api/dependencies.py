@@ -7,6 +7,7 @@ from fastapi import Depends, Header, HTTPException, Request
 from sqlalchemy import select
 
 from app.db.models import SessionLocal, api_keys
+from app.utils.offload import run_blocking
 
 
 from app.core.logger import get_logger
@@ -19,11 +20,8 @@ async def verify_api_key(x_api_key: str = Header(...)):
     Dependency to verify API key in requests and return the associated tenant information
     """
     logger.info("Verifying API key")
-    session = SessionLocal()
     try:
-        api_key_record = session.execute(
-            select(api_keys).where(api_keys.c.api_key == x_api_key)
-        ).fetchone()
+        api_key_record = await run_blocking(find_api_key, x_api_key)
         
         if not api_key_record:
             logger.warning("Invalid API key provided")
@@ -38,6 +36,17 @@ async def verify_api_key(x_api_key: str = Header(...)):
     except Exception as e:
         logger.error(f"Error verifying API key: {str(e)}")
         raise
+
+
+def find_api_key(api_key):
+    """
+    Look up the api_keys row of ``api_key``, or None.
+    """
+    session = SessionLocal()
+    try:
+        return session.execute(
+            select(api_keys).where(api_keys.c.api_key == api_key)
+        ).fetchone()
     finally:
         session.close()
 
@@ -53,7 +62,8 @@ async def require_valid_token(request: Request):
     token = auth_header.split(" ")[1].strip()
     print(f"Extracted token: {token}")
 
-    payload = verify_token(token)
+    # Fetching the signing keys from Keycloak is a blocking HTTP call
+    payload = await run_blocking(verify_token, token)
     if not payload:
         raise HTTPException(status_code=403, detail="Invalid or unauthorized token")
     return payload
@@ -1,7 +1,7 @@
 """
 API routes for data exchange in the Provider Adapter.
 """
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Query
 from fastapi.responses import FileResponse
 from sqlalchemy import select, insert
 import json
@@ -11,9 +11,17 @@ from pathlib import Path
 
 
 from app.api.dependencies import require_roles_factory, require_valid_token, verify_api_key
-from app.services.request_processor import process_request  # Import the function
+from app.services.admission import AdmissionRejected, admit, queue_depth
+from app.services.dispatch import notify_workers
+from app.services.job_queue import claim_next, count_claimable, request_lane, run_claimed_blocking, worker_id
+from app.services.criteria import InvalidCriteriaError
+from app.services.search_query import build_search_query
+from app.services.estimator import estimate_search, estimate_verify
+from app.services.part_registry import list_parts, part_path, summarize
+from app.utils.offload import run_blocking
+from app.utils.wire_format import JSON_FORMAT, SUPPORTED_FORMATS, format_available
 from app.db.models import SessionLocal, request_tracker
-from app.core.config import RESULTS_DIR
+from app.core.config import RESULTS_DIR, STATUS_PAGE_SIZE, JOB_WORKERS, JOB_EXTERNAL_WORKERS
 
 
 from app.core.logger import get_logger
@@ -23,6 +31,29 @@ logger = get_logger(__name__)
 
 router = APIRouter()
 
+def queue_request(tenant_id, request_id, request_data, estimated_rows):
+    """
+    Insert the tracker row of a new request.
+    """
+    session = SessionLocal()
+    try:
+        session.execute(
+            request_tracker.insert().values(
+                tenant_id=tenant_id,
+                request_id=request_id,
+                status="pending",
+                files=json.dumps([]),
+                error=None,
+                created_at=datetime.datetime.now(),
+                request_payload=request_data,  # Save the request payload
+                lane=request_lane(request_data),
+                estimated_rows=estimated_rows
+            )
+        )
+        session.commit()
+    finally:
+        session.close()
+
 @router.post("/create")
 async def receive_request(request_data: dict,
                             user_info: dict = Depends(require_roles_factory(["admin", "data_writer"])), api_key: dict = Depends(verify_api_key)):
@@ -41,35 +72,62 @@ async def receive_request(request_data: dict,
         request_type = header.get("request_type")
         tenant_id = header.get("tenant_id")
         
+        # Validate the preferred result format, if one was given
+        result_format = header.get("result_format", JSON_FORMAT)
+        if not format_available(result_format):
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported result_format '{result_format}', expected one of {list(SUPPORTED_FORMATS)}"
+            )
+        
+        # Reject search criteria that cannot be compiled before they are queued
+        if request_type == "search":
+            try:
+                build_search_query(request_data.get("body", {}).get("criteria", []))
+            except InvalidCriteriaError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid criteria: {e}")
+        
         # Validate tenant_id from API key
         if tenant_id != api_key["tenant_id"]:
             raise HTTPException(status_code=403, detail="Tenant ID does not match API key")
         
+        # Size the request and turn it away while the provider is saturated
+        body = request_data.get("body", {})
+        try:
+            if request_type == "search":
+                estimated_rows = (await run_blocking(estimate_search, body.get("criteria", [])))["rows"]
+            else:
+                estimated_rows = (await run_blocking(estimate_verify, body.get("citizens", [])))["rows"]
+        except Exception as e:
+            logger.warning(f"Could not estimate request {request_id}, admitting it unsized: {str(e)}")
+            estimated_rows = 0
+        try:
+            depth = await run_blocking(admit, api_key["api_key"], estimated_rows)
+        except AdmissionRejected as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+        
         # Update request_id if necessary
         if "request_id" not in header:
             request_data["header"]["request_id"] = request_id
         
         # Create a request tracker entry
-        session = SessionLocal()
-        session.execute(
-            request_tracker.insert().values(
-                tenant_id=tenant_id,
-                request_id=request_id,
-                status="pending",
-                files=json.dumps([]),
-                error=None,
-                created_at=datetime.datetime.now(),
-                request_payload=request_data  # Save the request payload
-            )
-        )
-        session.commit()
-        session.close()
+        await run_blocking(queue_request, tenant_id, request_id, request_data, estimated_rows)
         logger.info(f"Received request {request_id} of type {request_type} for tenant {tenant_id}")
         
+        # Wake an idle worker so processing starts now rather than at the next sweep
+        notify_workers()
+        
         return {
             "header": {
                 "request_id": request_id,
                 "status": "pending"
+            },
+            "body": {
+                "estimated_rows": estimated_rows,
+                "queue": {
+                    "requests": depth["requests"] + 1,
+                    "rows": depth["rows"] + estimated_rows
+                }
             }
         }
     
@@ -80,27 +138,102 @@ async def receive_request(request_data: dict,
         logger.error(f"Error processing request: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/estimate")
+async def estimate_request(request_data: dict,
+                           exact: bool = Query(False),
+                           user_info: dict = Depends(require_roles_factory(["admin", "data_writer"])), api_key: dict = Depends(verify_api_key)):
+    """
+    Dry run of a request: returns the expected rows, parts and approximate bytes without queuing it.
+    Search estimates use the optimizer by default; pass ``exact=true`` for a COUNT(*).
+    """
+    try:
+        if "header" not in request_data or "request_type" not in request_data["header"]:
+            raise HTTPException(status_code=400, detail="Invalid request format: missing header or request_type")
+        
+        header = request_data["header"]
+        request_type = header.get("request_type")
+        body = request_data.get("body", {})
+        
+        if request_type == "search":
+            estimate = await run_blocking(estimate_search, body.get("criteria", []), exact=exact)
+        elif request_type == "verify":
+            estimate = await run_blocking(estimate_verify, body.get("citizens", []))
+        else:
+            raise HTTPException(status_code=400, detail=f"Unsupported request_type '{request_type}'")
+        
+        return {
+            "header": {
+                "request_type": request_type,
+                "tenant_id": api_key["tenant_id"],
+                "timestamp": datetime.datetime.now().isoformat()
+            },
+            "body": estimate
+        }
+    
+    except InvalidCriteriaError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid criteria: {e}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error estimating request: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/queue")
+async def get_queue_depth(user_info: dict = Depends(require_roles_factory(["admin", "data_writer","data_reader"])), api_key: dict = Depends(verify_api_key)):
+    """
+    Current backlog of unfinished requests and estimated rows, in total and per lane,
+    so consumers can pace their submissions before they are rejected with 429.
+    """
+    try:
+        return {
+            "header": {
+                "tenant_id": api_key["tenant_id"],
+                "timestamp": datetime.datetime.now().isoformat()
+            },
+            "body": await run_blocking(queue_depth)
+        }
+    except Exception as e:
+        logger.error(f"Error reading queue depth: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def get_status_record(request_id, tenant_id):
+    """
+    Fetch the tracker row of a request owned by the tenant, or raise 404.
+    """
+    session = SessionLocal()
+    status_record = session.execute(
+        select(request_tracker).where(
+            request_tracker.c.request_id == request_id,
+            request_tracker.c.tenant_id == tenant_id
+        )
+    ).fetchone()
+    session.close()
+
+    if not status_record:
+        raise HTTPException(status_code=404, detail=f"Request ID {request_id} not found")
+    return status_record
+
 @router.get("/status/{request_id}")
-async def get_request_status(request_id: str,  user_info: dict = Depends(require_roles_factory(["admin", "data_writer","data_reader"])), api_key: dict = Depends(verify_api_key)):
+async def get_request_status(request_id: str,
+                             offset: int = Query(0, ge=0),
+                             limit: int = Query(STATUS_PAGE_SIZE, ge=1, le=STATUS_PAGE_SIZE),
+                             user_info: dict = Depends(require_roles_factory(["admin", "data_writer","data_reader"])), api_key: dict = Depends(verify_api_key)):
     """
-    Returns the status of a request, including any result files and error messages.
+    Returns the status of a request, a part summary, one page of result files and any error message.
+    Follow ``next_offset`` to page through the remaining files.
     """
     try:
         # Retrieve status from tracker
-        session = SessionLocal()
-        status_record = session.execute(
-            select(request_tracker).where(
-                request_tracker.c.request_id == request_id,
-                request_tracker.c.tenant_id == api_key["tenant_id"]
-            )
-        ).fetchone()
-        session.close()
-        
-        if not status_record:
-            raise HTTPException(status_code=404, detail=f"Request ID {request_id} not found")
+        status_record = await run_blocking(get_status_record, request_id, api_key["tenant_id"])
+        summary = summarize(status_record)
         
-        # Parse files JSON
-        files = json.loads(status_record.files) if status_record.files else []
+        # Parts are numbered 1..N, so a page of paths needs no registry scan
+        legacy_files = summary.pop("legacy_files", None)
+        if legacy_files is not None:
+            files = legacy_files[offset:offset + limit]
+        else:
+            files = [part_path(request_id, part) for part in range(offset + 1, min(offset + limit, summary["parts"]) + 1)]
+        next_offset = offset + limit if offset + limit < summary["parts"] else None
         
         return {
             "header": {
@@ -110,8 +243,12 @@ async def get_request_status(request_id: str,  user_info: dict = Depends(require
             },
             "body": {
                 "status": status_record.status,
+                "summary": summary,
                 "files": files,
-                "error": status_record.error
+                "next_offset": next_offset,
+                "error": status_record.error,
+                "attempts": status_record.attempts or 0,
+                "next_attempt_at": status_record.next_attempt_at.isoformat() if status_record.next_attempt_at else None
             }
         }
     
@@ -120,41 +257,100 @@ async def get_request_status(request_id: str,  user_info: dict = Depends(require
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/status/{request_id}/parts")
+async def get_request_parts(request_id: str,
+                            offset: int = Query(0, ge=0),
+                            limit: int = Query(STATUS_PAGE_SIZE, ge=1, le=STATUS_PAGE_SIZE),
+                            user_info: dict = Depends(require_roles_factory(["admin", "data_writer","data_reader"])), api_key: dict = Depends(verify_api_key)):
+    """
+    Returns one page of registered result parts with their row count, byte size and checksum.
+    """
+    try:
+        await run_blocking(get_status_record, request_id, api_key["tenant_id"])
+        parts = await run_blocking(list_parts, request_id, offset, limit)
+        
+        return {
+            "header": {
+                "request_id": request_id,
+                "tenant_id": api_key["tenant_id"],
+                "timestamp": datetime.datetime.now().isoformat()
+            },
+            "body": {
+                "parts": [
+                    {
+                        "part": part["part"],
+                        "path": part["path"],
+                        "row_count": part["row_count"],
+                        "byte_size": part["byte_size"],
+                        "checksum": part["checksum"],
+                        "created_at": part["created_at"].isoformat() if part["created_at"] else None
+                    }
+                    for part in parts
+                ],
+                "next_offset": offset + limit if len(parts) == limit else None
+            }
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def get_tracker_row(request_id):
+    """
+    Fetch the tracker row of a request as a mapping, or None.
+    """
+    session = SessionLocal()
+    try:
+        return session.execute(
+            select(request_tracker).where(request_tracker.c.request_id == request_id)
+        ).mappings().first()
+    finally:
+        session.close()
+
 @router.get("/process-requests")
 async def get_unprocessed_requests():
     """
-    Fetch all unprocessed requests from the request_tracker table and return updated saved request data.
+    Safety-net sweep for requests nobody is working on (missed dispatches, expired leases).
+    With in-process or external workers it only wakes them; otherwise it drains the job queue
+    itself and returns the updated tracker rows. Requests are claimed one at a time, so concurrent sweeps
+    and workers never process the same request twice.
     """
-    logger.info("Fetching unprocessed requests from the database")
     try:
-        session = SessionLocal()
-        unprocessed_requests = session.execute(
-            select(request_tracker).where(request_tracker.c.status != "completed")
-        ).mappings().all()
-        session.close()
+        if JOB_WORKERS > 0 or JOB_EXTERNAL_WORKERS:
+            orphaned = await run_blocking(count_claimable)
+            if orphaned:
+                notify_workers(orphaned)
+            logger.info(f"Sweep found {orphaned} claimable requests, dispatched to workers")
+            return {
+                "status": "success",
+                "dispatched": orphaned
+            }
 
-        logger.info(f"Fetched {len(unprocessed_requests)} unprocessed requests")
+        logger.info("Draining unprocessed requests from the job queue")
+        owner = worker_id("process-requests")
         updated_requests = []
 
-        # Process each unprocessed request
-        for request in unprocessed_requests:
+        # Process each claimable request
+        while True:
+            request = await run_blocking(claim_next, owner)
+            if request is None:
+                break
             try:
                 logger.info(f"Processing request ID: {request['request_id']}")
-                await process_request(request)
+                # Processing blocks, so it runs on the executor rather than the event loop
+                await run_blocking(run_claimed_blocking, request, owner)
                 logger.info(f"Successfully processed request ID: {request['request_id']}")
 
                 # Fetch updated request data
-                session = SessionLocal()
-                updated_request = session.execute(
-                    select(request_tracker).where(request_tracker.c.request_id == request['request_id'])
-                ).mappings().first()
-                session.close()
+                updated_request = await run_blocking(get_tracker_row, request['request_id'])
 
                 if updated_request:
                     updated_requests.append(updated_request)
             except Exception as e:
                 logger.error(f"Error processing request ID {request['request_id']}: {str(e)}")
 
+        logger.info(f"Processed {len(updated_requests)} requests")
         return {
             "status": "success",
             "data": updated_requests
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, Response
 from sqlalchemy import select
 
 import json
@@ -9,6 +9,10 @@ from app.db.models import SessionLocal, request_tracker
 from app.core.config import RESULTS_DIR, ENCRYPTION_KEYS, CURRENT_KEY_ID
 from app.utils.key_manager import KeyManager
 from app.utils.encryptor import Encryptor
+from app.utils.common import decrypt_file, find_part_file
+from app.services.part_registry import part_source
+from app.utils.offload import run_blocking
+from app.utils.wire_format import JSON_FORMAT, MEDIA_TYPES, encode_part, negotiate_format
 
 
 from app.core.logger import get_logger
@@ -24,46 +28,74 @@ encryptor = Encryptor(key_manager)
 router = APIRouter()
 
 
+def load_part(request_id, part, tenant_id):
+    """
+    Locate, authorize and decrypt one result part. Returns ``(decrypted_data, status_record)``.
+    """
+    # Check if result file exists, in either the binary or the JSON part format
+    file_path = find_part_file(RESULTS_DIR / request_id, part)
+    source_request_id = None
+    if file_path is None and part.isdigit():
+        # Parts served from the search cache live under the request that produced them
+        source_request_id = part_source(request_id, int(part))
+        if source_request_id:
+            file_path = find_part_file(RESULTS_DIR / source_request_id, part)
+    logger.debug(f"Resolved result file path: {file_path}")
+
+    if file_path is None:
+        logger.warning(f"Result file {part}.json not found for request {request_id}")
+        raise HTTPException(status_code=404, detail=f"Result file {part}.json not found for request {request_id}")
+
+    # Verify tenant_id has access to this request
+    session = SessionLocal()
+    logger.debug(f"Fetching request tracker record for request_id: {request_id}")
+    status_record = session.execute(
+        select(request_tracker).where(
+            request_tracker.c.request_id == request_id,
+            request_tracker.c.tenant_id == tenant_id
+        )
+    ).fetchone()
+    session.close()
+
+    if not status_record:
+        logger.warning(f"Unauthorized access attempt for request_id: {request_id}")
+        raise HTTPException(status_code=403, detail="Not authorized to access this request")
+    else:
+        logger.info(f"status_rocord : {status_record}")
+
+    # Read, decrypt and (for binary parts) decompress the file contents
+    decrypted_data = decrypt_file(file_path)
+    if source_request_id:
+        decrypted_data["header"].update(request_id=request_id, tenant_id=status_record.tenant_id)
+    return decrypted_data, status_record
+
+
 @router.get("/{request_id}/{part}.json")
-async def get_results(request_id: str, part: str,user_info: dict = Depends(require_roles_factory(["admin", "data_writer"])), api_key: dict = Depends(verify_api_key)):
+async def get_results(request_id: str, part: str, request: Request, user_info: dict = Depends(require_roles_factory(["admin", "data_writer"])), api_key: dict = Depends(verify_api_key)):
     """
     Returns the decrypted results file for a specific request and part.
+    The wire format is negotiated from the Accept header, falling back to the
+    ``result_format`` given in the request header, then JSON.
     """
     logger.info(f"Received request to fetch results for request_id: {request_id}, part: {part}")
     try:
-        # Check if result file exists
-        file_path = RESULTS_DIR / request_id / f"{part}.json"
-        logger.debug(f"Checking if file exists at path: {file_path}")
-
-        if not file_path.exists():
-            logger.warning(f"Result file {part}.json not found for request {request_id}")
-            raise HTTPException(status_code=404, detail=f"Result file {part}.json not found for request {request_id}")
-
-        # Verify tenant_id has access to this request
-        session = SessionLocal()
-        logger.debug(f"Fetching request tracker record for request_id: {request_id}")
-        status_record = session.execute(
-            select(request_tracker).where(
-                request_tracker.c.request_id == request_id,
-                request_tracker.c.tenant_id == api_key["tenant_id"]
-            )
-        ).fetchone()
-        session.close()
-
-        if not status_record:
-            logger.warning(f"Unauthorized access attempt for request_id: {request_id}")
-            raise HTTPException(status_code=403, detail="Not authorized to access this request")
-        else:
-            logger.info(f"status_rocord : {status_record}")
-
-        # Read and decrypt the file contents
-        with open(file_path, "r") as file:
-            encrypted_data = json.load(file)
-
-        decrypted_data = encryptor.decrypt(encrypted_data)
-
-        logger.info(f"Returning decrypted result for request_id: {request_id}, part: {part}")
-        return decrypted_data
+        # File I/O and decryption block, so they run on the executor
+        decrypted_data, status_record = await run_blocking(load_part, request_id, part, api_key["tenant_id"])
+
+        request_payload = status_record.request_payload or {}
+        if isinstance(request_payload, str):
+            request_payload = json.loads(request_payload)
+        default_format = request_payload.get("header", {}).get("result_format", JSON_FORMAT)
+        wire_format = negotiate_format(request.headers.get("accept"), default_format)
+
+        logger.info(f"Returning decrypted result for request_id: {request_id}, part: {part} as {wire_format}")
+        if wire_format == JSON_FORMAT:
+            return decrypted_data
+        return Response(
+            content=await run_blocking(encode_part, decrypted_data, wire_format),
+            media_type=MEDIA_TYPES[wire_format],
+            headers={"Vary": "Accept"}
+        )
 
     except HTTPException as http_exc:
         logger.error(f"HTTPException occurred: {http_exc.detail}")
@@ -39,6 +39,12 @@ DB_CONFIG = {
     'db': url.path.lstrip('/'),
 }
 
+# Connection pool settings, shared by SQLAlchemy sessions and raw pymysql connections;
+# DB_POOL_SIZE and DB_MAX_OVERFLOW are sized from the worker settings further down
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))  # Seconds to wait for a free connection before failing
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 3600))  # Reconnect connections older than this, in seconds
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"  # Test connections on checkout
+
 # Local Database Settings
 LOCAL_DB_URL = MYSQL_DB_URL
 
@@ -48,6 +54,88 @@ RESULTS_DIR.mkdir(exist_ok=True)
 
 # Batch Processing Settings
 BATCH_SIZE = int(os.getenv("BATCH_SIZE", 100))  # Default to 100 if not set
+VERIFY_LOOKUP_CHUNK_SIZE = int(os.getenv("VERIFY_LOOKUP_CHUNK_SIZE", 1000))  # Aadhars resolved per IN-list query
+SEARCH_PIPELINE_WORKERS = int(os.getenv("SEARCH_PIPELINE_WORKERS", 4))  # Threads encrypting and writing search parts
+SEARCH_PIPELINE_DEPTH = int(os.getenv("SEARCH_PIPELINE_DEPTH", 8))  # Search parts in flight before fetching pauses
+STATUS_PAGE_SIZE = int(os.getenv("STATUS_PAGE_SIZE", 1000))  # Result parts listed per status page
+ESTIMATE_BYTES_PER_ROW = int(os.getenv("ESTIMATE_BYTES_PER_ROW", 150))  # Used by /request/estimate until requests have completed
+ESTIMATE_BYTES_PER_ROW_REFRESH_SECONDS = int(os.getenv("ESTIMATE_BYTES_PER_ROW_REFRESH_SECONDS", 300))  # How long averages of completed requests are cached
+
+# Job queue settings
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))  # Concurrent request workers per node, 0 disables them
+JOB_EXTERNAL_WORKERS = os.getenv("JOB_EXTERNAL_WORKERS", "false").lower() == "true"  # Requests are run by python -m app.worker; the API never drains the queue
+JOB_POLL_SECONDS = int(os.getenv("JOB_POLL_SECONDS", 5))  # Idle wait between claim attempts
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 300))  # A claim expires unless heartbeated within this time
+JOB_HEARTBEAT_SECONDS = int(os.getenv("JOB_HEARTBEAT_SECONDS", 60))
+JOB_RETRY_SECONDS = int(os.getenv("JOB_RETRY_SECONDS", 300))  # Delay before the first retry, doubled per further attempt
+JOB_RETRY_MAX_SECONDS = int(os.getenv("JOB_RETRY_MAX_SECONDS", 21600))  # Upper bound of the retry backoff
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))  # Attempts before a request is moved to dead_letter
+JOB_INTERACTIVE_MAX_ROWS = int(os.getenv("JOB_INTERACTIVE_MAX_ROWS", 10000))  # Verify requests up to this size use the interactive lane
+JOB_INTERACTIVE_WORKERS = int(os.getenv("JOB_INTERACTIVE_WORKERS", 1))  # Workers per node that only take interactive requests
+TENANT_MAX_RUNNING_INTERACTIVE = int(os.getenv("TENANT_MAX_RUNNING_INTERACTIVE", 4))  # Per-tenant cap on running interactive requests
+TENANT_MAX_RUNNING_BULK = int(os.getenv("TENANT_MAX_RUNNING_BULK", 2))  # Per-tenant cap on running bulk requests
+TENANT_WEIGHTS = json.loads(os.getenv("TENANT_WEIGHTS", "{}"))  # e.g. {"pension_system": 2}; tenants default to 1
+
+# Admission control settings
+ADMISSION_RATE_PER_MINUTE = float(os.getenv("ADMISSION_RATE_PER_MINUTE", 60))  # New requests per API key per minute, 0 disables
+ADMISSION_BURST = int(os.getenv("ADMISSION_BURST", 20))  # Requests an API key may submit at once before the rate applies
+ADMISSION_MAX_PENDING_ROWS = int(os.getenv("ADMISSION_MAX_PENDING_ROWS", 50000000))  # Estimated rows of unfinished requests, 0 disables
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", 60))  # Retry-After sent when the pending rows cap is hit
+
+# Event loop settings
+BLOCKING_EXECUTOR_WORKERS = int(os.getenv("BLOCKING_EXECUTOR_WORKERS", 16))  # Threads running blocking work for API handlers
+LOOP_LAG_INTERVAL_SECONDS = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", 0.5))  # Event loop lag sampling interval
+LOOP_LAG_WARN_MS = int(os.getenv("LOOP_LAG_WARN_MS", 100))  # Log a warning above this event loop lag, 0 disables
+
+# Pool sizes default to the threads that can hold a connection at once: every blocking
+# executor thread plus every job worker, and a spare per job worker for the tracker
+# session it opens while its raw connection is checked out
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", BLOCKING_EXECUTOR_WORKERS + JOB_WORKERS))  # Connections kept open
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", max(JOB_WORKERS, 1)))  # Extra connections opened under load
+
+# Standalone worker (python -m app.worker) settings
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", os.cpu_count() or 1))  # Worker processes, one per core by default
+WORKER_THREADS = int(os.getenv("WORKER_THREADS", 1))  # Request workers inside each process
+WORKER_MAX_MEMORY_MB = int(os.getenv("WORKER_MAX_MEMORY_MB", 2048))  # Recycle a worker above this RSS, 0 disables
+WORKER_RESTART_BACKOFF_SECONDS = int(os.getenv("WORKER_RESTART_BACKOFF_SECONDS", 5))
+WORKER_WAKE_PORT = int(os.getenv("WORKER_WAKE_PORT", 7400))  # UDP port the worker supervisor listens on for wake-ups, 0 disables
+WORKER_WAKE_ADDRESSES = [
+    address.strip()
+    for address in os.getenv("WORKER_WAKE_ADDRESSES", f"127.0.0.1:{WORKER_WAKE_PORT}").split(",")
+    if address.strip()
+]  # host:port of every worker node the API wakes when JOB_EXTERNAL_WORKERS is on
+
+# Result part storage settings
+PART_FORMAT = os.getenv("PART_FORMAT", "json").lower()  # "json" (base64 in JSON) or "binary" (compressed raw ciphertext)
+PART_COMPRESSION = os.getenv("PART_COMPRESSION", "gzip").lower()  # Binary parts: "gzip", "zstd" or "none"
+PART_COMPRESSION_LEVEL = int(os.getenv("PART_COMPRESSION_LEVEL", 6))
+
+# Citizen snapshot settings
+CITIZEN_SNAPSHOT_ENABLED = os.getenv("CITIZEN_SNAPSHOT_ENABLED", "false").lower() == "true"
+CITIZEN_SNAPSHOT_DIR = Path(os.environ.get('CITIZEN_SNAPSHOT_DIR', './snapshot'))
+CITIZEN_SNAPSHOT_REFRESH_MINUTES = int(os.getenv("CITIZEN_SNAPSHOT_REFRESH_MINUTES", 15))
+SEARCH_FROM_SNAPSHOT = os.getenv("SEARCH_FROM_SNAPSHOT", "false").lower() == "true"  # Filter searches over the snapshot's columns
+
+# Probabilistic name matching settings
+NAME_INDEX_ENABLED = os.getenv("NAME_INDEX_ENABLED", "false").lower() == "true"
+NAME_INDEX_NGRAM = int(os.getenv("NAME_INDEX_NGRAM", 3))
+NAME_INDEX_REFRESH_MINUTES = int(os.getenv("NAME_INDEX_REFRESH_MINUTES", 15))
+NAME_INDEX_REBUILD_HOURS = int(os.getenv("NAME_INDEX_REBUILD_HOURS", 24))  # Full rebuilds drop citizens deleted since the last one
+# Grams with more postings than this in a block are skipped at query time. The index itself
+# costs roughly 2 KB per citizen in every process that builds it (about 2 GB per million citizens)
+NAME_INDEX_MAX_POSTINGS = int(os.getenv("NAME_INDEX_MAX_POSTINGS", 10000))
+NAME_CANDIDATES_TOP_K = int(os.getenv("NAME_CANDIDATES_TOP_K", 10))  # Candidates scored per citizen
+NAME_MATCH_AGE_TOLERANCE = int(os.getenv("NAME_MATCH_AGE_TOLERANCE", 2))  # Years
+
+# Search result cache settings
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "false").lower() == "true"  # Reuse parts of identical fresh searches
+
+# Search index advisor settings
+SEARCH_EXPLAIN_ENABLED = os.getenv("SEARCH_EXPLAIN_ENABLED", "true").lower() == "true"  # Warn when a search will full-scan
+INDEX_ADVISOR_ENABLED = os.getenv("INDEX_ADVISOR_ENABLED", "false").lower() == "true"  # Create/drop managed citizens indexes
+INDEX_ADVISOR_MIN_HITS = int(os.getenv("INDEX_ADVISOR_MIN_HITS", 5))  # Searches with a criteria shape before it gets an index
+INDEX_ADVISOR_MAX_INDEXES = int(os.getenv("INDEX_ADVISOR_MAX_INDEXES", 8))
+INDEX_ADVISOR_REFRESH_MINUTES = int(os.getenv("INDEX_ADVISOR_REFRESH_MINUTES", 1440))
 
 # API Settings
 PROJECT_NAME = "Food Department Adapter API"
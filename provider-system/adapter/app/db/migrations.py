@@ -0,0 +1,88 @@
+"""
+Idempotent schema upgrade for the Provider Adapter's own tables.
+
+``metadata.create_all`` only creates missing tables; it never changes a table that
+already exists, so a database created by an older release would lack the columns and
+indexes added since. ``upgrade_schema`` runs right after it at startup and adds every
+missing column and index declared in ``app.db.models``, and widens the columns whose
+type grew. Running it again on an up-to-date database changes nothing.
+
+The business ``citizens`` table is not managed here.
+"""
+from sqlalchemy import BigInteger, inspect, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.schema import CreateIndex
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+UNMANAGED_TABLES = {"citizens"}
+
+# Duplicate column name, duplicate key name
+ALREADY_APPLIED_MYSQL_ERRORS = {1060, 1061}
+
+# (table, column) pairs created as INT by older releases and BIGINT now
+WIDENED_COLUMNS = [
+    ("request_tracker", "result_bytes"),
+    ("search_cache", "result_bytes"),
+]
+
+
+def _column_ddl(engine, column):
+    ddl = f"{column.name} {column.type.compile(dialect=engine.dialect)}"
+    if not column.nullable and not column.primary_key:
+        ddl += " NOT NULL"
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        ddl += f" DEFAULT {default!r}" if isinstance(default, str) else f" DEFAULT {default}"
+    return ddl
+
+
+def upgrade_schema(engine, metadata):
+    """
+    Bring existing tables up to ``metadata``. Returns the DDL statements that were run.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    statements = []
+
+    for table in metadata.sorted_tables:
+        if table.name in UNMANAGED_TABLES or table.name not in existing_tables:
+            continue
+
+        columns = {column["name"]: column for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                statements.append(f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(engine, column)}")
+
+        if engine.dialect.name == "mysql":
+            for table_name, column_name in WIDENED_COLUMNS:
+                current = columns.get(column_name)
+                if table_name == table.name and current is not None and not isinstance(current["type"], BigInteger):
+                    statements.append(
+                        f"ALTER TABLE {table.name} MODIFY COLUMN {_column_ddl(engine, table.c[column_name])}"
+                    )
+
+        index_names = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in index_names:
+                statements.append(str(CreateIndex(index).compile(dialect=engine.dialect)))
+
+    if not statements:
+        return statements
+
+    for statement in statements:
+        logger.info(f"Upgrading schema: {statement}")
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(statement))
+        except DBAPIError as e:
+            # Another process starting at the same time applied it first
+            if getattr(e.orig, "args", None) and e.orig.args[0] in ALREADY_APPLIED_MYSQL_ERRORS:
+                logger.info(f"Schema change already applied: {statement}")
+                continue
+            raise
+    return statements
@@ -1,13 +1,18 @@
 """
 Database models and connection handling for the Provider Adapter.
 """
-from sqlalchemy import create_engine, Column, String, Integer, Float, DateTime, JSON, MetaData, Table
+from sqlalchemy import create_engine, Column, String, Integer, BigInteger, Float, DateTime, JSON, MetaData, Table
 from sqlalchemy.orm import sessionmaker
 import datetime
 import json
 
 
-from app.core.config import DEFAULT_API_KEY, DEFAULT_TENANT_ID, DEFAULT_DEPARTMENT, MYSQL_DB_URL
+from app.core.config import (
+    DEFAULT_API_KEY, DEFAULT_TENANT_ID, DEFAULT_DEPARTMENT, MYSQL_DB_URL,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+)
+from app.db.migrations import upgrade_schema
+from app.db.pool import TimedQueuePool
 
 
 from app.core.logger import get_logger
@@ -15,8 +20,17 @@ from app.core.logger import get_logger
 logger = get_logger(__name__)
 
 
-# Initialize engine with pymysql driver
-engine = create_engine(MYSQL_DB_URL.replace('mysql://', 'mysql+pymysql://'))
+# Initialize engine with pymysql driver. Its pool also serves raw connections from
+# app.db.session.get_db_connection
+engine = create_engine(
+    MYSQL_DB_URL.replace('mysql://', 'mysql+pymysql://'),
+    poolclass=TimedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING
+)
 metadata = MetaData()
 
 # Define tables
@@ -25,12 +39,66 @@ request_tracker = Table(
     metadata,
     Column("tenant_id", String(50), primary_key=True),
     Column("request_id", String(50), primary_key=True),
-    Column("status", String(20)),
+    Column("status", String(20), index=True),
     Column("files", JSON),
     Column("error", String(255)),
     Column("created_at", DateTime),
     Column("request_payload", JSON),
-    Column("last_processed_index", Integer, default=0)
+    Column("last_processed_index", Integer, default=0),
+    Column("last_aadhar", String(12)),
+    Column("part_count", Integer, default=0),
+    Column("result_rows", Integer, default=0),
+    Column("result_bytes", BigInteger, default=0),
+    Column("lane", String(20)),
+    Column("estimated_rows", Integer, default=0),
+    Column("lease_owner", String(100)),
+    Column("lease_expires_at", DateTime),
+    Column("heartbeat_at", DateTime),
+    Column("attempts", Integer, default=0),
+    Column("next_attempt_at", DateTime)
+)
+
+# One row per tenant and lane, locked while a worker claims for them so the concurrency
+# cap is checked and taken atomically
+tenant_claims = Table(
+    "tenant_claims",
+    metadata,
+    Column("tenant_id", String(50), primary_key=True),
+    Column("lane", String(20), primary_key=True),
+)
+
+result_parts = Table(
+    "result_parts",
+    metadata,
+    Column("request_id", String(50), primary_key=True),
+    Column("part", Integer, primary_key=True),
+    Column("path", String(255)),
+    Column("row_count", Integer),
+    Column("byte_size", Integer),
+    Column("checksum", String(64)),
+    Column("created_at", DateTime),
+    Column("source_request_id", String(50)),  # Set when the part file belongs to a cached request
+)
+
+search_cache = Table(
+    "search_cache",
+    metadata,
+    Column("cache_key", String(64), primary_key=True),
+    Column("source_request_id", String(50)),
+    Column("fingerprint", String(64)),
+    Column("part_count", Integer),
+    Column("result_rows", Integer),
+    Column("result_bytes", BigInteger),
+    Column("created_at", DateTime),
+)
+
+criteria_usage = Table(
+    "criteria_usage",
+    metadata,
+    Column("shape", String(255), primary_key=True),
+    Column("columns", String(255)),
+    Column("hits", Integer, default=0),
+    Column("last_used", DateTime),
 )
 
 api_keys = Table(
@@ -56,8 +124,9 @@ citizens = Table(
     Column("updated_on", DateTime),
 )
 
-# Create tables
+# Create tables, then add the columns and indexes newer releases introduced to existing ones
 metadata.create_all(engine)
+upgrade_schema(engine, metadata)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
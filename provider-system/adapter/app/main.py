@@ -6,11 +6,16 @@ from app.api.routes import api_router
 from app.core.config import PROJECT_NAME, PROJECT_DESCRIPTION, VERSION, CONTEXT_PATH
 # from app.tasks.job_processor import start_scheduler, setup_rabbitmq
 from app.db.models import metadata, engine
+from app.db.pool import pool_stats
 from sqlalchemy.exc import OperationalError
 import pika
 import time
 import logging
 from app.scheduler import scheduler
+from app.services.worker_pool import WorkerPool
+from app.utils import offload
+from app.utils.loop_monitor import loop_monitor
+from app.core.config import JOB_WORKERS, JOB_INTERACTIVE_WORKERS
 
 logger = logging.getLogger(__name__)
 
@@ -41,13 +46,26 @@ async def root():
         "version": VERSION
     }
 
+@app.get(f"{CONTEXT_PATH}/metrics", tags=["status"])
+async def metrics():
+    """
+    Event loop lag, blocking executor load and database pool checkouts of this API process
+    """
+    return {
+        "event_loop_lag": loop_monitor.stats(),
+        "blocking_executor": offload.stats(),
+        "db_pool": pool_stats(engine)
+    }
+
 # Ensure MySQL and RabbitMQ are started before the service starts
 @app.on_event("startup")
 def check_dependencies():
     # Check MySQL connection
     while True:
         try:
-            engine.connect()
+            # Give the probe connection back to the pool
+            with engine.connect():
+                pass
             print("MySQL is up and running.")
             break
         except OperationalError:
@@ -59,6 +77,8 @@ def check_dependencies():
 async def startup_event():
     # Create all tables
     metadata.create_all(engine)
+    # Measure how long the event loop is kept from serving requests
+    loop_monitor.start()
     # Setup RabbitMQ queues
     # setup_rabbitmq()
     # Start the scheduler for processing jobs
@@ -66,12 +86,21 @@ async def startup_event():
 
 
 
+# Request workers claiming jobs from the request_tracker queue
+# Never reserve every worker for interactive requests, or bulk requests would not run at all
+worker_pool = WorkerPool(JOB_WORKERS, interactive_workers=min(JOB_INTERACTIVE_WORKERS, max(JOB_WORKERS - 1, 0)))
+
 @app.on_event("startup")
 def on_startup():
     scheduler.start()
+    if JOB_WORKERS > 0:
+        worker_pool.start()
 
 @app.on_event("shutdown")
 def on_shutdown():
+    loop_monitor.stop()
+    worker_pool.stop()
     scheduler.stop()
+    offload.executor.shutdown(wait=False)
 
 logger.info("Application started successfully")
\ No newline at end of file
@@ -0,0 +1,17 @@
+from datetime import datetime
+from app.core.logger import get_logger
+from app.services.index_advisor import ensure_indexes
+
+
+logger = get_logger(__name__)
+
+def maintain_search_indexes():
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    try:
+        created, dropped = ensure_indexes()
+
+        logger.info(f"[INDEX-ADVISOR] {now} -> created {len(created)}, dropped {len(dropped)} indexes")
+
+    except Exception as e:
+        logger.error(f"[INDEX-ADVISOR] {now} -> ERROR: {e}")
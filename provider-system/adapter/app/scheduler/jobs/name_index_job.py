@@ -0,0 +1,17 @@
+from datetime import datetime
+from app.core.logger import get_logger
+from app.services.name_index import refresh_name_index
+
+
+logger = get_logger(__name__)
+
+def refresh_citizen_name_index():
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    try:
+        index = refresh_name_index()
+
+        logger.info(f"[NAME-INDEX] {now} -> {len(index)} citizens indexed")
+
+    except Exception as e:
+        logger.error(f"[NAME-INDEX] {now} -> ERROR: {e}")
@@ -0,0 +1,20 @@
+from datetime import datetime
+from app.core.logger import get_logger
+from app.services.citizen_snapshot import refresh_snapshot
+
+
+logger = get_logger(__name__)
+
+def refresh_citizen_snapshot():
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    try:
+        manifest = refresh_snapshot()
+        if manifest is None:
+            logger.info(f"[SNAPSHOT] {now} -> skipped, another process is refreshing the snapshot")
+            return
+
+        logger.info(f"[SNAPSHOT] {now} -> version {manifest['version']} with {manifest['row_count']} rows")
+
+    except Exception as e:
+        logger.error(f"[SNAPSHOT] {now} -> ERROR: {e}")
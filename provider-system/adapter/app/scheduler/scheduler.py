@@ -1,6 +1,15 @@
+from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.scheduler.jobs.process_job import process_pending_requests
+from app.scheduler.jobs.snapshot_job import refresh_citizen_snapshot
+from app.scheduler.jobs.name_index_job import refresh_citizen_name_index
+from app.scheduler.jobs.index_advisor_job import maintain_search_indexes
 from app.utils.cron_token import get_cron_trigger
+from app.core.config import (
+    CITIZEN_SNAPSHOT_ENABLED, CITIZEN_SNAPSHOT_REFRESH_MINUTES,
+    NAME_INDEX_ENABLED, NAME_INDEX_REFRESH_MINUTES,
+    INDEX_ADVISOR_ENABLED, INDEX_ADVISOR_REFRESH_MINUTES
+)
 
 
 
@@ -28,9 +37,62 @@ def schedule_process_job():
     logger.info(" Scheduled job: process_pending_requests")
 
 
+def schedule_snapshot_job():
+    """
+    Schedule incremental refreshes of the citizen snapshot when it is enabled.
+    """
+    if not CITIZEN_SNAPSHOT_ENABLED:
+        return
+    scheduler.add_job(
+        refresh_citizen_snapshot,
+        trigger="interval",
+        minutes=CITIZEN_SNAPSHOT_REFRESH_MINUTES,
+        id="refresh-citizen-snapshot",
+        replace_existing=True,
+        next_run_time=datetime.now()
+    )
+    logger.info(" Scheduled job: refresh_citizen_snapshot")
+
+
+def schedule_name_index_job():
+    """
+    Schedule the build and incremental refreshes of the name candidate index when it is enabled.
+    """
+    if not NAME_INDEX_ENABLED:
+        return
+    scheduler.add_job(
+        refresh_citizen_name_index,
+        trigger="interval",
+        minutes=NAME_INDEX_REFRESH_MINUTES,
+        id="refresh-name-index",
+        replace_existing=True,
+        next_run_time=datetime.now()
+    )
+    logger.info(" Scheduled job: refresh_citizen_name_index")
+
+
+def schedule_index_advisor_job():
+    """
+    Schedule managed citizens index maintenance at startup and then periodically, when enabled.
+    """
+    if not INDEX_ADVISOR_ENABLED:
+        return
+    scheduler.add_job(
+        maintain_search_indexes,
+        trigger="interval",
+        minutes=INDEX_ADVISOR_REFRESH_MINUTES,
+        id="maintain-search-indexes",
+        replace_existing=True,
+        next_run_time=datetime.now()
+    )
+    logger.info(" Scheduled job: maintain_search_indexes")
+
 
 def start():
     schedule_process_job()
+    schedule_snapshot_job()
+    schedule_name_index_job()
+    schedule_index_advisor_job()
     scheduler.start()
     logger.info(" Scheduler started.")
 
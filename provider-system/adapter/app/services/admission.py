@@ -0,0 +1,139 @@
+"""
+Admission control for new requests.
+
+Each API key gets a token bucket of ADMISSION_BURST requests refilled at
+ADMISSION_RATE_PER_MINUTE, and the provider as a whole accepts new work only while the
+estimated rows of all unfinished requests stay under ADMISSION_MAX_PENDING_ROWS. A request
+that is turned away gets a ``Retry-After`` hint instead of being queued behind a backlog
+it would time out in.
+
+Buckets live in the API process, so each replica rate limits on its own; the pending rows
+cap is read from ``request_tracker`` and is shared by all replicas.
+"""
+import math
+import threading
+import time
+
+from sqlalchemy import func, select
+
+from app.core.config import (
+    ADMISSION_RATE_PER_MINUTE, ADMISSION_BURST, ADMISSION_MAX_PENDING_ROWS, ADMISSION_RETRY_AFTER_SECONDS
+)
+from app.db.models import SessionLocal, request_tracker
+from app.services.job_queue import TERMINAL_STATUSES
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request is not admitted; ``retry_after`` is in whole seconds.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket holding up to ``burst`` tokens, refilled at ``rate`` per second.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """
+        Take one token. Returns 0 on success, otherwise the seconds until a token is available.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """
+        Give back a token taken for a request that was not admitted after all.
+        """
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def _bucket(key):
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = _buckets[key] = TokenBucket(ADMISSION_RATE_PER_MINUTE / 60, ADMISSION_BURST)
+        return bucket
+
+
+def queue_depth():
+    """
+    Unfinished requests and their estimated rows, in total and per lane.
+    """
+    lane = func.coalesce(request_tracker.c.lane, "bulk")
+    session = SessionLocal()
+    try:
+        rows = session.execute(
+            select(lane, func.count(), func.coalesce(func.sum(request_tracker.c.estimated_rows), 0))
+            .where(request_tracker.c.status.not_in(TERMINAL_STATUSES))
+            .group_by(lane)
+        ).fetchall()
+    finally:
+        session.close()
+
+    lanes = {name: {"requests": count, "rows": int(pending_rows)} for name, count, pending_rows in rows}
+    return {
+        "requests": sum(entry["requests"] for entry in lanes.values()),
+        "rows": sum(entry["rows"] for entry in lanes.values()),
+        "max_rows": ADMISSION_MAX_PENDING_ROWS,
+        "lanes": lanes
+    }
+
+
+def admit(api_key, estimated_rows):
+    """
+    Admit a new request of ``estimated_rows`` for ``api_key`` or raise AdmissionRejected.
+    Returns the queue depth the request was admitted into. A request turned away because
+    the provider is saturated does not use up the key's rate limit.
+    """
+    bucket = _bucket(api_key) if ADMISSION_RATE_PER_MINUTE > 0 else None
+    if bucket is not None:
+        wait = bucket.take()
+        if wait:
+            raise AdmissionRejected("Request rate limit exceeded", max(1, math.ceil(wait)))
+
+    try:
+        depth = queue_depth()
+    except Exception:
+        if bucket is not None:
+            bucket.refund()
+        raise
+    if ADMISSION_MAX_PENDING_ROWS > 0:
+        pending_rows = depth["rows"]
+        # A single request larger than the cap is still accepted into an empty queue
+        if pending_rows and pending_rows + estimated_rows > ADMISSION_MAX_PENDING_ROWS:
+            if bucket is not None:
+                bucket.refund()
+            logger.warning(
+                f"Rejecting request of ~{estimated_rows} rows: {pending_rows} rows pending "
+                f"(limit {ADMISSION_MAX_PENDING_ROWS})"
+            )
+            raise AdmissionRejected("Provider is saturated, too much pending work", ADMISSION_RETRY_AFTER_SECONDS)
+    return depth
@@ -0,0 +1,539 @@
+"""
+Memory-mapped columnar snapshot of the citizens table for the Provider matching engine.
+
+The snapshot is a directory of NumPy ``.npy`` column files sorted by aadhar. Worker
+processes open it with ``mmap_mode='r'`` so they all share the page cache instead of
+holding their own copy of the table. A ``manifest.json`` points at the current base
+version, an optional delta version and the ``updated_on``/``created_on`` watermark.
+
+Incremental refreshes only rewrite the (small) delta of rows modified since the base was
+built; lookups check the delta before the base. Once the delta grows past
+SNAPSHOT_COMPACT_RATIO of the base it is merged into a new base.
+
+Rows served from the snapshot remember where they came from, so the verify criteria for
+them are evaluated as NumPy column masks over the mapped arrays (``evaluate_criteria``).
+Searches whose criteria the snapshot answers exactly like MySQL (see
+``compile_snapshot_criteria``) can be filtered the same way with ``CitizenSnapshot.select``.
+
+Builds convert the streamed rows FETCH_SIZE at a time, so only one chunk of the table is
+ever held as Python objects.
+
+The snapshot is served as of its last refresh: rows changed in MySQL since then are
+returned stale for up to CITIZEN_SNAPSHOT_REFRESH_MINUTES, and only aadhars missing from
+the snapshot fall through to MySQL. Deletes are not visible to incremental refreshes;
+run a full rebuild (``python -m app.services.citizen_snapshot --full``) to drop them.
+
+Builds and refreshes take an exclusive lock file in the snapshot directory, so only one
+process on a host writes the snapshot; the others skip their refresh.
+"""
+import argparse
+import contextlib
+import datetime
+import fcntl
+import itertools
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pymysql
+
+from app.core.config import CITIZEN_SNAPSHOT_DIR
+from app.db.session import db_connection
+from app.services.criteria import InvalidCriteriaError, compile_criteria
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+SNAPSHOT_FORMAT = 2
+STRING_COLUMNS = ["aadhar", "name", "gender", "caste", "location", "phone_number"]
+INT_COLUMNS = ["age"]
+DATE_COLUMNS = ["created_on", "updated_on"]
+MISSING_INT = -1
+FETCH_SIZE = 10000
+SELECT_BLOCK_ROWS = 100000
+SNAPSHOT_COMPACT_RATIO = 0.1
+
+
+def _encode(value):
+    return str(value).encode("utf-8") if value is not None else b""
+
+
+def _decode(value):
+    return value.decode("utf-8") if value else ""
+
+
+def _null_column(name):
+    return f"{name}_null"
+
+
+def _to_epoch(value):
+    if value is None:
+        return 0
+    return int(value.timestamp())
+
+
+def _load_columns(version_dir, names):
+    return {name: np.load(version_dir / f"{name}.npy", mmap_mode="r") for name in names}
+
+
+def _read_manifest(snapshot_dir):
+    manifest_path = snapshot_dir / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, "r") as file:
+        return json.load(file)
+
+
+class SnapshotRow(dict):
+    """
+    A citizen row materialized from a snapshot segment, with its position in that segment.
+    """
+
+    def __init__(self, values, segment, position):
+        super().__init__(values)
+        self.segment = segment
+        self.position = position
+
+
+class SnapshotSegment:
+    """
+    Read-only view over one version directory. Columns are memory-mapped NumPy arrays.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.aadhar = columns["aadhar"]
+
+    def __len__(self):
+        return len(self.aadhar)
+
+    def row(self, index):
+        """
+        Materialize the row at ``index`` as a SnapshotRow shaped like ``SELECT * FROM citizens``.
+        """
+        row = {}
+        for name in STRING_COLUMNS:
+            null = bool(self.columns[_null_column(name)][index])
+            row[name] = None if null else _decode(self.columns[name][index])
+        for name in INT_COLUMNS:
+            value = int(self.columns[name][index])
+            row[name] = value if value != MISSING_INT else None
+        for name in DATE_COLUMNS:
+            value = self.columns[name][index]
+            row[name] = None if np.isnat(value) else value.astype("datetime64[us]").item()
+        return SnapshotRow(row, self, int(index))
+
+    def take(self, positions):
+        """
+        Gather the citizen columns at ``positions`` (index list or slice). Returns
+        ``(columns, nulls)`` keyed by field name, the shape ``CompiledCriteria`` takes.
+        """
+        columns, nulls = {}, {}
+        for name in STRING_COLUMNS:
+            columns[name] = self.columns[name][positions]
+            nulls[name] = self.columns[_null_column(name)][positions]
+        for name in INT_COLUMNS:
+            columns[name] = self.columns[name][positions]
+            nulls[name] = columns[name] == MISSING_INT
+        for name in DATE_COLUMNS:
+            columns[name] = self.columns[name][positions]
+            nulls[name] = np.isnat(columns[name])
+        return columns, nulls
+
+    def select(self, predicate, after_aadhar=None):
+        """
+        Positions of the rows matching a compiled predicate, in aadhar order, optionally
+        only those after ``after_aadhar``. Masks are evaluated SELECT_BLOCK_ROWS at a time.
+        """
+        start = 0 if after_aadhar is None else int(np.searchsorted(self.aadhar, _encode(after_aadhar), side="right"))
+        selected = []
+        for block in range(start, len(self), SELECT_BLOCK_ROWS):
+            end = min(block + SELECT_BLOCK_ROWS, len(self))
+            columns, nulls = self.take(slice(block, end))
+            selected.append(block + np.flatnonzero(predicate.mask(columns, end - block, nulls)))
+        return np.concatenate(selected) if selected else np.zeros(0, dtype=np.int64)
+
+    def find_indices(self, aadhars):
+        """
+        Binary-search the sorted aadhar column. Returns (positions, found_mask).
+        """
+        encoded = [_encode(aadhar) for aadhar in aadhars]
+        keys = np.array(encoded, dtype=self.aadhar.dtype)
+        if not len(self.aadhar):
+            return np.zeros(len(keys), dtype=np.int64), np.zeros(len(keys), dtype=bool)
+
+        # Keys wider than the column would be truncated on conversion and must never match
+        fits = np.array([len(key) <= self.aadhar.dtype.itemsize for key in encoded], dtype=bool)
+        positions = np.minimum(np.searchsorted(self.aadhar, keys), len(self.aadhar) - 1)
+        return positions, fits & (self.aadhar[positions] == keys)
+
+    def lookup(self, aadhars):
+        """
+        Resolve aadhars to citizen rows. Returns a dict keyed by aadhar; misses are absent.
+        """
+        aadhars = [str(aadhar) for aadhar in aadhars]
+        if not aadhars or not len(self):
+            return {}
+
+        positions, found = self.find_indices(aadhars)
+        return {
+            aadhar: self.row(position)
+            for aadhar, position, hit in zip(aadhars, positions, found)
+            if hit
+        }
+
+
+class CitizenSnapshot:
+    """
+    Current snapshot: a base segment plus an optional delta of rows modified since.
+    """
+
+    def __init__(self, base, delta, manifest):
+        self.base = base
+        self.delta = delta
+        self.manifest = manifest
+
+    @classmethod
+    def load(cls, snapshot_dir=CITIZEN_SNAPSHOT_DIR):
+        """
+        Open the current snapshot, or return None if no snapshot in the current format exists.
+        """
+        manifest = _read_manifest(snapshot_dir)
+        if manifest is None or manifest.get("format") != SNAPSHOT_FORMAT:
+            return None
+
+        base = SnapshotSegment(_load_columns(snapshot_dir / manifest["version"], manifest["columns"]))
+        delta = None
+        if manifest.get("delta"):
+            delta = SnapshotSegment(_load_columns(snapshot_dir / manifest["delta"], manifest["columns"]))
+        return cls(base, delta, manifest)
+
+    def __len__(self):
+        return self.manifest["row_count"]
+
+    def lookup(self, aadhars):
+        """
+        Resolve aadhars to citizen rows, preferring the delta. Misses are absent.
+        """
+        aadhars = [str(aadhar) for aadhar in aadhars]
+        matched = self.delta.lookup(aadhars) if self.delta is not None else {}
+        matched.update(self.base.lookup([aadhar for aadhar in aadhars if aadhar not in matched]))
+        return matched
+
+    def select(self, predicate, after_aadhar=None, columns=None):
+        """
+        Yield the rows matching a compiled predicate in aadhar order, as dicts of
+        ``columns`` (all citizen columns by default). Base rows replaced by the delta are
+        matched on their delta version only.
+        """
+        base_positions = self.base.select(predicate, after_aadhar)
+        hits = [(self.base, base_positions)]
+        if self.delta is not None:
+            replaced = np.isin(self.base.aadhar[base_positions], self.delta.aadhar)
+            hits = [(self.base, base_positions[~replaced]), (self.delta, self.delta.select(predicate, after_aadhar))]
+
+        keys = np.concatenate([segment.aadhar[positions] for segment, positions in hits])
+        sources = [(segment, position) for segment, positions in hits for position in positions]
+        for index in np.argsort(keys, kind="stable"):
+            segment, position = sources[index]
+            row = segment.row(position)
+            yield row if columns is None else {name: row[name] for name in columns}
+
+
+def compile_snapshot_criteria(criteria):
+    """
+    Compile search criteria for ``CitizenSnapshot.select``, or return None when the
+    snapshot cannot answer them exactly as MySQL would: LIKE/NEAR, date columns, values
+    of another type than the column, or string ordering comparisons (MySQL's collation
+    is case-insensitive there; ``=``, ``!=`` and IN fold case like it).
+    """
+    try:
+        predicate = compile_criteria(criteria)
+    except InvalidCriteriaError:
+        return None
+
+    for criterion in predicate.criteria:
+        values = criterion.value if criterion.operator in ("IN", "BETWEEN") else [criterion.value]
+        if criterion.field in STRING_COLUMNS:
+            exact = criterion.operator in ("=", "!=", "IN") and all(isinstance(value, str) for value in values)
+        elif criterion.field in INT_COLUMNS:
+            exact = all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values)
+        else:
+            exact = False
+        if not exact:
+            return None
+    return predicate
+
+
+def evaluate_criteria(predicate, rows):
+    """
+    ``criteria_results`` for matched rows, in order. Rows served from the snapshot are
+    evaluated in one column batch per segment; rows fetched from MySQL row by row.
+    """
+    results = [None] * len(rows)
+    batches = {}
+    for index, row in enumerate(rows):
+        if isinstance(row, SnapshotRow):
+            segment, indices, positions = batches.setdefault(id(row.segment), (row.segment, [], []))
+            indices.append(index)
+            positions.append(row.position)
+        else:
+            results[index] = predicate.evaluate(row)
+
+    for segment, indices, positions in batches.values():
+        columns, nulls = segment.take(positions)
+        for index, result in zip(indices, predicate.evaluate_columns(columns, nulls)):
+            results[index] = result
+    return results
+
+
+def stream_citizen_rows(since=None):
+    """
+    Stream citizens rows from MySQL, optionally only those modified at or after ``since``.
+    """
+    query = (
+        "SELECT aadhar, name, age, gender, caste, location, phone_number, created_on, updated_on, "
+        "COALESCE(updated_on, created_on) AS modified_on FROM citizens"
+    )
+    params = []
+    if since is not None:
+        query += " WHERE updated_on >= %s OR created_on >= %s"
+        params = [since, since]
+
+    with db_connection() as connection:
+        with connection.cursor(pymysql.cursors.SSDictCursor) as cursor:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                yield from rows
+
+
+def _chunk_to_columns(rows):
+    names = STRING_COLUMNS + [_null_column(name) for name in STRING_COLUMNS] + INT_COLUMNS + DATE_COLUMNS
+    columns = {name: [] for name in names + ["modified_on"]}
+    for row in rows:
+        for name in STRING_COLUMNS:
+            columns[name].append(_encode(row[name]))
+            columns[_null_column(name)].append(row[name] is None)
+        columns["age"].append(row["age"] if row["age"] is not None else MISSING_INT)
+        for name in DATE_COLUMNS:
+            columns[name].append(np.datetime64(row[name], "us") if row[name] is not None else np.datetime64("NaT", "us"))
+        columns["modified_on"].append(_to_epoch(row["modified_on"]))
+
+    arrays = {name: np.array(columns[name], dtype=bytes) for name in STRING_COLUMNS}
+    for name in STRING_COLUMNS:
+        arrays[_null_column(name)] = np.array(columns[_null_column(name)], dtype=bool)
+    arrays["age"] = np.array(columns["age"], dtype=np.int32)
+    for name in DATE_COLUMNS:
+        arrays[name] = np.array(columns[name], dtype="datetime64[us]")
+    arrays["modified_on"] = np.array(columns["modified_on"], dtype=np.int64)
+    return arrays
+
+
+def _rows_to_columns(rows):
+    """
+    Convert streamed rows into column arrays FETCH_SIZE rows at a time.
+    """
+    rows = iter(rows)
+    chunks = []
+    while True:
+        chunk = list(itertools.islice(rows, FETCH_SIZE))
+        if chunk or not chunks:
+            chunks.append(_chunk_to_columns(chunk))
+        if len(chunk) < FETCH_SIZE:
+            break
+
+    if len(chunks) == 1:
+        return chunks[0]
+    # Concatenation widens each string column to its widest chunk
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+
+def _merge_columns(base, delta):
+    """
+    Replace rows in ``base`` whose aadhar appears in ``delta`` and append the rest.
+    """
+    keep = ~np.isin(base["aadhar"], delta["aadhar"])
+    merged = {}
+    for name in base:
+        kept = np.asarray(base[name])[keep]
+        if kept.dtype.kind == "S":
+            width = max(kept.dtype.itemsize, delta[name].dtype.itemsize)
+            merged[name] = np.concatenate([kept.astype(f"S{width}"), delta[name].astype(f"S{width}")])
+        else:
+            merged[name] = np.concatenate([kept, delta[name]])
+    return merged
+
+
+def _write_segment(snapshot_dir, columns, prefix):
+    """
+    Sort columns by aadhar and write them to a new version directory. Returns its name.
+    """
+    order = np.argsort(columns["aadhar"], kind="stable")
+    version = datetime.datetime.now().strftime(f"{prefix}%Y%m%d%H%M%S%f")
+    version_dir = snapshot_dir / version
+    version_dir.mkdir(parents=True, exist_ok=True)
+
+    for name, values in columns.items():
+        np.save(version_dir / f"{name}.npy", np.ascontiguousarray(np.asarray(values)[order]))
+    return version
+
+
+def _watermark(columns, previous=0):
+    if not len(columns["modified_on"]):
+        return previous
+    return max(previous, int(columns["modified_on"].max()))
+
+
+def _publish(snapshot_dir, manifest, previous):
+    """
+    Swap the manifest, then remove version directories referenced by neither the new nor
+    the previous manifest (readers may still have the previous one mapped).
+    """
+    temp_manifest = snapshot_dir / f"{MANIFEST_FILE}.tmp"
+    with open(temp_manifest, "w") as file:
+        json.dump(manifest, file)
+    os.replace(temp_manifest, snapshot_dir / MANIFEST_FILE)
+
+    referenced = {manifest["version"], manifest.get("delta")}
+    if previous is not None:
+        referenced |= {previous.get("version"), previous.get("delta")}
+    for path in snapshot_dir.iterdir():
+        if path.is_dir() and path.name not in referenced:
+            shutil.rmtree(path, ignore_errors=True)
+    return manifest
+
+
+def _manifest(base_version, columns, row_count, delta_version=None, delta_rows=0, watermark=0):
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "version": base_version,
+        "delta": delta_version,
+        "columns": list(columns),
+        "row_count": int(row_count),
+        "delta_rows": int(delta_rows),
+        "watermark": watermark,
+        "built_at": datetime.datetime.now().isoformat(),
+    }
+
+
+@contextlib.contextmanager
+def _writer_lock(snapshot_dir):
+    """
+    Exclusive, non-blocking lock for writing the snapshot. Yields False if another process holds it.
+    """
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    with open(snapshot_dir / LOCK_FILE, "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _build(snapshot_dir, previous):
+    columns = _rows_to_columns(stream_citizen_rows())
+    version = _write_segment(snapshot_dir, columns, "v")
+    manifest = _publish(snapshot_dir, _manifest(
+        version, columns, len(columns["aadhar"]), watermark=_watermark(columns)
+    ), previous)
+    logger.info(f"Citizen snapshot {version} written with {manifest['row_count']} rows")
+    return manifest
+
+
+def build_snapshot(snapshot_dir=CITIZEN_SNAPSHOT_DIR):
+    """
+    Export the full citizens table into a new base version. Returns the manifest, or None
+    when another process is writing the snapshot.
+    """
+    with _writer_lock(snapshot_dir) as locked:
+        if not locked:
+            logger.info("Citizen snapshot is being written by another process, skipping build")
+            return None
+        return _build(snapshot_dir, _read_manifest(snapshot_dir))
+
+
+def refresh_snapshot(snapshot_dir=CITIZEN_SNAPSHOT_DIR):
+    """
+    Incrementally refresh the snapshot from rows modified since its watermark by rewriting
+    only the delta, compacting it into a new base once it is large. Falls back to a full
+    build when no snapshot exists yet. Returns None when another process is writing it.
+    """
+    with _writer_lock(snapshot_dir) as locked:
+        if not locked:
+            logger.info("Citizen snapshot is being refreshed by another process, skipping")
+            return None
+
+        previous = _read_manifest(snapshot_dir)
+        current = CitizenSnapshot.load(snapshot_dir)
+        if current is None:
+            return _build(snapshot_dir, previous)
+
+        manifest = current.manifest
+        since = datetime.datetime.fromtimestamp(manifest["watermark"])
+        changes = _rows_to_columns(stream_citizen_rows(since))
+        if not len(changes["aadhar"]):
+            logger.info("Citizen snapshot is up to date")
+            return manifest
+
+        delta = _merge_columns(current.delta.columns, changes) if current.delta is not None else changes
+        watermark = _watermark(changes, manifest["watermark"])
+        if len(delta["aadhar"]) > SNAPSHOT_COMPACT_RATIO * max(len(current.base), 1):
+            logger.info(f"Compacting citizen snapshot delta of {len(delta['aadhar'])} rows into a new base")
+            merged = _merge_columns(current.base.columns, delta)
+            version = _write_segment(snapshot_dir, merged, "v")
+            return _publish(snapshot_dir, _manifest(
+                version, merged, len(merged["aadhar"]), watermark=watermark
+            ), previous)
+
+        logger.info(f"Refreshing citizen snapshot delta with {len(changes['aadhar'])} modified rows")
+        delta_version = _write_segment(snapshot_dir, delta, "d")
+        # Rows in the delta that replace base rows are not new
+        new_rows = int((~np.isin(delta["aadhar"], current.base.aadhar)).sum())
+        return _publish(snapshot_dir, _manifest(
+            manifest["version"], delta, len(current.base) + new_rows,
+            delta_version=delta_version, delta_rows=len(delta["aadhar"]), watermark=watermark
+        ), previous)
+
+
+_snapshot_lock = threading.Lock()
+_snapshot = None
+
+
+def get_snapshot():
+    """
+    Return the process-wide snapshot, reopening it when a newer version was published.
+    """
+    global _snapshot
+    with _snapshot_lock:
+        manifest = _read_manifest(CITIZEN_SNAPSHOT_DIR)
+        if manifest is None:
+            return None
+        current = (manifest.get("version"), manifest.get("delta"))
+        if _snapshot is None or (_snapshot.manifest["version"], _snapshot.manifest.get("delta")) != current:
+            _snapshot = CitizenSnapshot.load(CITIZEN_SNAPSHOT_DIR)
+        return _snapshot
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or refresh the citizen snapshot")
+    parser.add_argument("--full", action="store_true", help="Rebuild from scratch instead of refreshing")
+    args = parser.parse_args()
+
+    if args.full:
+        build_snapshot()
+    else:
+        refresh_snapshot()
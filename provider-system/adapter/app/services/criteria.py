@@ -0,0 +1,245 @@
+"""
+Criteria compiler for verify requests.
+
+A request's ``criteria`` list is validated and compiled once into a predicate that
+evaluates whole batches of matched citizens, either as dict rows (one precompiled test
+per criterion, no per-row operator dispatch) or as NumPy column arrays (one vectorized
+mask per criterion). Both paths give the same result for the same rows.
+
+String equality and IN are case-insensitive, matching the original verify semantics.
+Comparisons against missing values, or values of another type, are False.
+"""
+import datetime
+
+import numpy as np
+
+
+SUPPORTED_OPERATORS = ("=", "!=", ">", ">=", "<", "<=", "IN", "BETWEEN")
+
+
+class InvalidCriteriaError(ValueError):
+    """Raised when a criteria list cannot be compiled."""
+
+
+def _fold(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+def _scalar_test(operator, value):
+    """
+    Build the per-value test for one criterion. Comparisons against missing values are False.
+    """
+    if operator == "=":
+        target = _fold(value)
+        return lambda actual: _fold(actual) == target
+    if operator == "!=":
+        target = _fold(value)
+        return lambda actual: _fold(actual) != target
+    if operator == "IN":
+        targets = {_fold(item) for item in value}
+        return lambda actual: _fold(actual) in targets
+
+    def guarded(compare):
+        def test(actual):
+            try:
+                return actual is not None and compare(actual)
+            except TypeError:
+                return False
+        return test
+
+    if operator == ">":
+        return guarded(lambda actual: actual > value)
+    if operator == ">=":
+        return guarded(lambda actual: actual >= value)
+    if operator == "<":
+        return guarded(lambda actual: actual < value)
+    if operator == "<=":
+        return guarded(lambda actual: actual <= value)
+    low, high = value
+    return guarded(lambda actual: low <= actual <= high)
+
+
+def _comparable(column, value):
+    """
+    Whether ``value`` compares with the values of ``column`` the way it would with the
+    matching Python values; other pairs never match (``!=`` always does).
+    """
+    kind = column.dtype.kind
+    if kind in "SU":
+        return isinstance(value, str)
+    if kind in "biuf":
+        return isinstance(value, (int, float))
+    if kind == "M":
+        return isinstance(value, datetime.datetime)
+    return False
+
+
+def _column_target(column, value):
+    """
+    Convert a comparable criterion value to the dtype domain of a NumPy column.
+    """
+    if column.dtype.kind == "S":
+        return value.encode("utf-8")
+    if column.dtype.kind == "M":
+        return np.datetime64(value, "us")
+    return value
+
+
+def _folded(column):
+    """
+    Case-folded copy of a string column for ``=``, ``!=`` and IN.
+    """
+    if column.dtype.kind == "S":
+        return np.char.lower(np.char.decode(column, "utf-8"))
+    if column.dtype.kind == "U":
+        return np.char.lower(column)
+    return column
+
+
+def _fold_target(column, value):
+    return value.lower() if isinstance(value, str) else _column_target(column, value)
+
+
+def _null_match(operator, value):
+    """
+    Result of a criterion on a missing (None) value, as the scalar test gives it.
+    """
+    if operator == "=":
+        return value is None
+    if operator == "!=":
+        return value is not None
+    if operator == "IN":
+        return any(item is None for item in value)
+    return False
+
+
+class CompiledCriterion:
+    """
+    One validated ``field operator value`` criterion.
+    """
+
+    def __init__(self, field, operator, value):
+        self.field = field
+        self.operator = operator
+        self.value = value
+        self.test = _scalar_test(operator, value)
+
+    def mask(self, column, null=None):
+        """
+        Vectorized boolean mask of this criterion over a column array. ``null`` marks the
+        positions whose value is missing.
+        """
+        column = np.asarray(column)
+        operator, value = self.operator, self.value
+        nothing = np.zeros(len(column), dtype=bool)
+
+        if operator in ("=", "!="):
+            equal = _folded(column) == _fold_target(column, value) if _comparable(column, value) else nothing
+            selected = equal if operator == "=" else ~equal
+        elif operator == "IN":
+            targets = [_fold_target(column, item) for item in value if _comparable(column, item)]
+            selected = np.isin(_folded(column), targets) if targets else nothing
+        elif operator == "BETWEEN":
+            low, high = value
+            if _comparable(column, low) and _comparable(column, high):
+                selected = (column >= _column_target(column, low)) & (column <= _column_target(column, high))
+            else:
+                selected = nothing
+        elif not _comparable(column, value):
+            selected = nothing
+        else:
+            target = _column_target(column, value)
+            if operator == ">":
+                selected = column > target
+            elif operator == ">=":
+                selected = column >= target
+            elif operator == "<":
+                selected = column < target
+            else:
+                selected = column <= target
+
+        if null is not None:
+            selected = np.where(np.asarray(null, dtype=bool), _null_match(operator, value), selected)
+        return np.asarray(selected, dtype=bool)
+
+
+class CompiledCriteria:
+    """
+    Predicate over a whole criteria list, built once per request.
+    """
+
+    def __init__(self, criteria):
+        self.criteria = criteria
+
+    def evaluate(self, row):
+        """
+        ``criteria_results`` for one matched row. Criteria on fields the row does not have are skipped.
+        """
+        return [
+            {"field": criterion.field, "match": bool(criterion.test(row[criterion.field]))}
+            for criterion in self.criteria
+            if criterion.field in row
+        ]
+
+    def evaluate_rows(self, rows):
+        """
+        ``criteria_results`` for a batch of dict rows.
+        """
+        return [self.evaluate(row) for row in rows]
+
+    def evaluate_columns(self, columns, nulls=None):
+        """
+        ``criteria_results`` for a batch given as ``{field: array}`` columns of equal length,
+        with optional ``{field: bool array}`` null masks. Criteria on fields without a
+        column are skipped, as for dict rows.
+        """
+        nulls = nulls or {}
+        masks = [
+            (criterion.field, criterion.mask(columns[criterion.field], nulls.get(criterion.field)))
+            for criterion in self.criteria
+            if criterion.field in columns
+        ]
+        size = len(next(iter(columns.values()))) if columns else 0
+        return [
+            [{"field": field, "match": bool(mask[row])} for field, mask in masks]
+            for row in range(size)
+        ]
+
+    def mask(self, columns, size, nulls=None):
+        """
+        Combined AND mask over column arrays with SQL semantics: missing values never
+        match, and criteria on fields without a column fail every row.
+        """
+        nulls = nulls or {}
+        selected = np.ones(size, dtype=bool)
+        for criterion in self.criteria:
+            if criterion.field not in columns:
+                return np.zeros(size, dtype=bool)
+            selected &= criterion.mask(columns[criterion.field])
+            if criterion.field in nulls:
+                selected &= ~np.asarray(nulls[criterion.field], dtype=bool)
+        return selected
+
+
+def compile_criteria(criteria):
+    """
+    Validate a request's criteria list and compile it into a CompiledCriteria predicate.
+    """
+    compiled = []
+    for criterion in criteria or []:
+        try:
+            field = criterion["field"]
+            operator = str(criterion["operator"]).strip().upper()
+            value = criterion["value"]
+        except (KeyError, TypeError):
+            raise InvalidCriteriaError(f"Invalid criterion, expected field/operator/value: {criterion}")
+
+        if operator not in SUPPORTED_OPERATORS:
+            raise InvalidCriteriaError(f"Unsupported operator '{criterion['operator']}' for field '{field}'")
+        if operator == "IN" and not isinstance(value, (list, tuple)):
+            raise InvalidCriteriaError(f"IN criterion on '{field}' needs a list value")
+        if operator == "BETWEEN" and (not isinstance(value, (list, tuple)) or len(value) != 2):
+            raise InvalidCriteriaError(f"BETWEEN criterion on '{field}' needs a [low, high] value")
+
+        compiled.append(CompiledCriterion(field, operator, value))
+    return CompiledCriteria(compiled)
@@ -0,0 +1,146 @@
+"""
+Dispatch channel between the API and the request workers.
+
+``/request/create`` notifies the channel after a request is committed, which wakes an
+idle worker in this process straight away instead of at its next poll.
+
+Workers in other processes (``python -m app.worker``) are woken across processes: with
+JOB_EXTERNAL_WORKERS on, ``notify_workers`` also sends a UDP datagram to every address in
+WORKER_WAKE_ADDRESSES. The worker supervisor on each node listens on WORKER_WAKE_PORT and
+broadcasts the wake-up to its worker processes, which relay it to their own channel. A
+lost datagram only delays a request until the next JOB_POLL_SECONDS poll.
+"""
+import socket
+import threading
+
+from app.core.config import JOB_EXTERNAL_WORKERS, WORKER_WAKE_ADDRESSES
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class Dispatcher:
+    """
+    Counting wake-up channel: every ``notify`` lets one waiting worker through.
+
+    Signals beyond the number of waiting workers are dropped (one is kept when none is
+    waiting): a busy worker claims again before it waits, so a backlog of N requests must
+    not make the next N ``wait`` calls return at once to find nothing to claim.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._pending = 0
+        self._waiting = 0
+
+    def notify(self, count=1):
+        """
+        Signal that ``count`` new requests are ready to be claimed.
+        """
+        with self._condition:
+            self._pending = min(self._pending + count, max(self._waiting, 1))
+            self._condition.notify(count)
+
+    def wake_all(self):
+        """
+        Wake every waiting worker without signalling work, e.g. on shutdown.
+        """
+        with self._condition:
+            self._condition.notify_all()
+
+    def wait(self, timeout):
+        """
+        Block until work is signalled or ``timeout`` passes. Returns True if work was signalled.
+        """
+        with self._condition:
+            if not self._pending:
+                self._waiting += 1
+                try:
+                    self._condition.wait(timeout)
+                finally:
+                    self._waiting -= 1
+            if self._pending:
+                self._pending -= 1
+                return True
+            return False
+
+
+dispatcher = Dispatcher()
+
+_wake_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+_wake_socket.setblocking(False)
+_wake_targets = {}
+
+
+def _wake_target(address):
+    """
+    Resolve ``host:port`` once; returns None (and retries next time) if it does not resolve.
+    """
+    target = _wake_targets.get(address)
+    if target is None:
+        host, _, port = address.rpartition(":")
+        try:
+            target = socket.getaddrinfo(host, int(port), socket.AF_INET, socket.SOCK_DGRAM)[0][4]
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot resolve worker wake-up address {address}: {str(e)}")
+            return None
+        _wake_targets[address] = target
+    return target
+
+
+def notify_workers(count=1):
+    """
+    Signal ``count`` new requests to the workers in this process and, with
+    JOB_EXTERNAL_WORKERS, to the worker processes on every WORKER_WAKE_ADDRESSES node.
+    """
+    dispatcher.notify(count)
+    if not JOB_EXTERNAL_WORKERS:
+        return
+    for address in WORKER_WAKE_ADDRESSES:
+        target = _wake_target(address)
+        if target is None:
+            continue
+        try:
+            _wake_socket.sendto(str(count).encode(), target)
+        except OSError as e:
+            logger.debug(f"Could not wake workers at {address}: {str(e)}")
+
+
+def listen_for_wakeups(port, condition, generation, stopping):
+    """
+    Supervisor side: receive wake-up datagrams on ``port`` and broadcast them to the worker
+    processes by advancing the shared ``generation`` counter under ``condition``.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as listener:
+        listener.bind(("0.0.0.0", port))
+        listener.settimeout(1)
+        logger.info(f"Listening for worker wake-ups on UDP port {port}")
+        while not stopping.is_set():
+            try:
+                data, _ = listener.recvfrom(64)
+            except socket.timeout:
+                continue
+            try:
+                count = max(int(data), 1)
+            except ValueError:
+                count = 1
+            with condition:
+                generation.value += count
+                condition.notify_all()
+
+
+def relay_wakeups(condition, generation, stopping):
+    """
+    Worker process side: turn advances of the shared ``generation`` counter into
+    notifications on this process's dispatcher.
+    """
+    seen = generation.value
+    while not stopping.is_set():
+        with condition:
+            condition.wait_for(lambda: generation.value != seen, timeout=1)
+            current = generation.value
+        if current != seen:
+            dispatcher.notify(current - seen)
+            seen = current
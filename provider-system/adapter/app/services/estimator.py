@@ -0,0 +1,106 @@
+"""
+Size estimates for requests before they are submitted.
+
+Search estimates come from the optimizer (EXPLAIN rows x filtered) by default, which
+answers in milliseconds without touching the data, or from an exact COUNT(*) on request.
+Verify estimates follow directly from the number of submitted citizens. Byte sizes use the
+average bytes per row of completed requests of the same type, falling back to
+ESTIMATE_BYTES_PER_ROW. The averages are cached and recomputed at most every
+ESTIMATE_BYTES_PER_ROW_REFRESH_SECONDS, so estimates and admission do not aggregate
+request_tracker on every call.
+"""
+import math
+import threading
+import time
+
+from sqlalchemy import func, select
+
+from app.core.config import BATCH_SIZE, ESTIMATE_BYTES_PER_ROW, ESTIMATE_BYTES_PER_ROW_REFRESH_SECONDS
+from app.db.models import SessionLocal, request_tracker
+from app.db.session import db_connection
+from app.services.search_query import build_search_query, to_pymysql
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+_averages_lock = threading.Lock()
+_averages = {}
+_averages_at = None
+
+
+def _load_averages():
+    """
+    Average stored bytes per result row of completed requests, keyed by request type.
+    """
+    request_type = request_tracker.c.request_payload["header"]["request_type"].as_string()
+    session = SessionLocal()
+    try:
+        rows = session.execute(
+            select(request_type, func.sum(request_tracker.c.result_rows), func.sum(request_tracker.c.result_bytes))
+            .where(request_tracker.c.status == "completed")
+            .group_by(request_type)
+        ).fetchall()
+    finally:
+        session.close()
+
+    return {name: size / count for name, count, size in rows if count and size}
+
+
+def bytes_per_row(request_type):
+    """
+    Average stored bytes per result row of completed ``request_type`` requests, refreshed
+    every ESTIMATE_BYTES_PER_ROW_REFRESH_SECONDS.
+    """
+    global _averages, _averages_at
+    with _averages_lock:
+        if _averages_at is None or time.monotonic() - _averages_at >= ESTIMATE_BYTES_PER_ROW_REFRESH_SECONDS:
+            try:
+                _averages = _load_averages()
+            except Exception as e:
+                # Keep estimating from the previous averages rather than failing the request
+                logger.warning(f"Could not refresh bytes per row averages: {str(e)}")
+            _averages_at = time.monotonic()
+        return _averages.get(request_type, ESTIMATE_BYTES_PER_ROW)
+
+
+def _sized(rows, method, request_type, min_parts=0):
+    return {
+        "method": method,
+        "rows": int(rows),
+        "parts": max(min_parts, math.ceil(rows / BATCH_SIZE)),
+        "bytes": int(rows * bytes_per_row(request_type))
+    }
+
+
+def estimate_search(criteria, exact=False):
+    """
+    Expected rows, parts and bytes of a search. Raises InvalidCriteriaError for bad criteria.
+    """
+    query, params = to_pymysql(build_search_query(criteria))
+
+    with db_connection() as connection:
+        with connection.cursor() as cursor:
+            if exact:
+                cursor.execute(f"SELECT COUNT(*) AS row_count FROM ({query}) AS matches", params)
+                rows = cursor.fetchone()["row_count"]
+            else:
+                cursor.execute(f"EXPLAIN {query}", params)
+                plan = cursor.fetchall()
+                rows = 0
+                for step in plan:
+                    if step.get("table") == "citizens":
+                        rows = (step.get("rows") or 0) * float(step.get("filtered") or 100) / 100
+
+    logger.debug(f"Estimated {rows} rows for search criteria {criteria}")
+    return _sized(rows, "count" if exact else "explain", "search")
+
+
+def estimate_verify(citizens):
+    """
+    Expected rows, parts and bytes of a verify request: one result per submitted citizen.
+    """
+    # An empty verify request still writes one (empty) part
+    return _sized(len(citizens or []), "count", "verify", min_parts=1)
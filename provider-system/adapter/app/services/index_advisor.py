@@ -0,0 +1,168 @@
+"""
+Index advisor for search requests on the citizens table.
+
+Every new search records the composite index shape that would serve its criteria in
+``criteria_usage``. The advisor turns the most used shapes into managed secondary indexes
+on ``citizens`` (named ``ix_citizens_auto_*``), skips shapes already covered by the prefix
+of an existing index and drops managed indexes that are no longer recommended.
+
+Each incoming search is also EXPLAINed so a query that will full-scan is logged up front.
+
+Run it by hand with ``python -m app.services.index_advisor [--dry-run]``.
+"""
+import argparse
+import datetime
+import hashlib
+
+from sqlalchemy import Index, inspect, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import INDEX_ADVISOR_MIN_HITS, INDEX_ADVISOR_MAX_INDEXES
+from app.db.models import SessionLocal, citizens, criteria_usage, engine
+from app.services.search_query import index_columns
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+MANAGED_PREFIX = "ix_citizens_auto_"
+MAX_INDEX_NAME = 64  # MySQL identifier limit
+
+
+def index_name(columns):
+    """
+    Stable name of the managed index over ``columns``.
+    """
+    name = MANAGED_PREFIX + "_".join(columns)
+    if len(name) > MAX_INDEX_NAME:
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:8]
+        name = f"{name[:MAX_INDEX_NAME - 9]}_{digest}"
+    return name
+
+
+def record_criteria_usage(criteria):
+    """
+    Count one search against the index shape of its criteria.
+    """
+    columns = index_columns(criteria)
+    if not columns:
+        return
+    shape = ",".join(columns)
+    now = datetime.datetime.now()
+
+    session = SessionLocal()
+    try:
+        bump = (
+            update(criteria_usage)
+            .where(criteria_usage.c.shape == shape)
+            .values(hits=criteria_usage.c.hits + 1, last_used=now)
+        )
+        if session.execute(bump).rowcount == 0:
+            try:
+                session.execute(insert(criteria_usage).values(shape=shape, columns=shape, hits=1, last_used=now))
+            except IntegrityError:
+                # Another search inserted the same shape first
+                session.rollback()
+                session.execute(bump)
+        session.commit()
+    finally:
+        session.close()
+
+
+def recommend_indexes(min_hits=INDEX_ADVISOR_MIN_HITS, max_indexes=INDEX_ADVISOR_MAX_INDEXES):
+    """
+    Most used index shapes, as column tuples. A shape that is a prefix of a more used
+    recommendation is served by that index and is not recommended separately.
+    """
+    session = SessionLocal()
+    try:
+        rows = session.execute(
+            select(criteria_usage.c.columns)
+            .where(criteria_usage.c.hits >= min_hits)
+            .order_by(criteria_usage.c.hits.desc())
+        ).fetchall()
+    finally:
+        session.close()
+
+    recommended = []
+    for (shape,) in rows:
+        columns = tuple(shape.split(","))
+        if any(chosen[:len(columns)] == columns for chosen in recommended):
+            continue
+        # A longer shape also serves every recommended shape that is its prefix
+        recommended = [chosen for chosen in recommended if columns[:len(chosen)] != chosen]
+        recommended.append(columns)
+        if len(recommended) >= max_indexes:
+            break
+    return recommended
+
+
+def ensure_indexes(min_hits=INDEX_ADVISOR_MIN_HITS, max_indexes=INDEX_ADVISOR_MAX_INDEXES, dry_run=False):
+    """
+    Create recommended indexes that are missing and drop stale managed ones.
+    Returns ``(created, dropped)`` index names.
+    """
+    recommended = recommend_indexes(min_hits, max_indexes)
+    existing = inspect(engine).get_indexes(citizens.name)
+    wanted = {index_name(columns) for columns in recommended}
+
+    # Only indexes that survive this run can cover a shape: unmanaged ones and managed
+    # ones that are still recommended, not those about to be dropped as stale
+    surviving_columns = [
+        tuple(index["column_names"]) for index in existing
+        if not index["name"].startswith(MANAGED_PREFIX) or index["name"] in wanted
+    ]
+
+    created, dropped = [], []
+    for columns in recommended:
+        name = index_name(columns)
+        if any(covering[:len(columns)] == columns for covering in surviving_columns):
+            continue
+        logger.info(f"Creating index {name} on citizens ({', '.join(columns)})")
+        if not dry_run:
+            Index(name, *(citizens.c[column] for column in columns)).create(engine)
+        created.append(name)
+
+    for index in existing:
+        if index["name"].startswith(MANAGED_PREFIX) and index["name"] not in wanted:
+            logger.info(f"Dropping stale managed index {index['name']}")
+            if not dry_run:
+                Index(index["name"], *(citizens.c[column] for column in index["column_names"])).drop(engine)
+            dropped.append(index["name"])
+
+    return created, dropped
+
+
+def warn_on_full_scan(connection, query, params):
+    """
+    EXPLAIN a search query and log a warning when MySQL plans a full table scan.
+    Never raises; a failed EXPLAIN only loses the warning.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {query}", params)
+            plan = cursor.fetchall()
+    except Exception as e:
+        logger.debug(f"EXPLAIN failed for search query: {e}")
+        return
+
+    for step in plan:
+        if step.get("type") == "ALL":
+            logger.warning(
+                f"Search will full-scan {step.get('table')} (~{step.get('rows')} rows); "
+                f"possible keys: {step.get('possible_keys')}. Query: {query}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and maintain managed citizens indexes from search usage")
+    parser.add_argument("--min-hits", type=int, default=INDEX_ADVISOR_MIN_HITS)
+    parser.add_argument("--max-indexes", type=int, default=INDEX_ADVISOR_MAX_INDEXES)
+    parser.add_argument("--dry-run", action="store_true", help="Only report the indexes that would change")
+    args = parser.parse_args()
+
+    created, dropped = ensure_indexes(args.min_hits, args.max_indexes, args.dry_run)
+    print(f"created: {created or 'none'}")
+    print(f"dropped: {dropped or 'none'}")
@@ -0,0 +1,354 @@
+"""
+Work queue on top of ``request_tracker``.
+
+Workers claim one request at a time with ``SELECT ... FOR UPDATE SKIP LOCKED`` and take a
+lease on it (``lease_owner``/``lease_expires_at``). While a request runs, a heartbeat keeps
+extending the lease; a request whose worker died becomes claimable again once its lease
+expires. Several workers and several provider replicas can therefore drain the backlog in
+parallel without processing a request twice.
+
+Requests are split into an interactive lane (small verify requests) and a bulk lane.
+Interactive work is always claimed first and some workers only take interactive work, so
+small requests are not stuck behind bulk searches. Within a lane tenants get a weighted
+fair share of the running slots, up to a per-tenant concurrency cap. The cap is checked
+again after locking the tenant's ``tenant_claims`` row, in the transaction that takes the
+lease, so concurrent workers cannot both take a tenant's last slot.
+
+Every claim counts as an attempt. A failed request waits ``next_attempt_at`` with an
+exponential backoff before it is claimed again, and moves to ``dead_letter`` after
+JOB_MAX_ATTEMPTS attempts, or at once when its error cannot be fixed by retrying.
+``completed`` and ``dead_letter`` requests are never claimed again.
+"""
+import asyncio
+import datetime
+import os
+import socket
+import threading
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import (
+    JOB_LEASE_SECONDS, JOB_HEARTBEAT_SECONDS, JOB_RETRY_SECONDS, JOB_RETRY_MAX_SECONDS, JOB_MAX_ATTEMPTS,
+    JOB_INTERACTIVE_MAX_ROWS,
+    TENANT_MAX_RUNNING_INTERACTIVE, TENANT_MAX_RUNNING_BULK, TENANT_WEIGHTS
+)
+from app.db.models import SessionLocal, request_tracker, tenant_claims
+from app.services.request_processor import process_request
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+COMPLETED = "completed"
+DEAD_LETTER = "dead_letter"
+TERMINAL_STATUSES = (COMPLETED, DEAD_LETTER)
+
+INTERACTIVE_LANE = "interactive"
+BULK_LANE = "bulk"
+LANES = (INTERACTIVE_LANE, BULK_LANE)
+LANE_TENANT_CAPS = {
+    INTERACTIVE_LANE: TENANT_MAX_RUNNING_INTERACTIVE,
+    BULK_LANE: TENANT_MAX_RUNNING_BULK,
+}
+
+
+def worker_id(name=None):
+    """
+    Lease owner name for a worker: host, process and worker name.
+    """
+    name = name or threading.current_thread().name
+    return f"{socket.gethostname()}:{os.getpid()}:{name}"
+
+
+def _claimable(now):
+    return (
+        request_tracker.c.status.not_in(TERMINAL_STATUSES),
+        or_(
+            request_tracker.c.lease_expires_at.is_(None),
+            request_tracker.c.lease_expires_at < now
+        ),
+        or_(
+            request_tracker.c.next_attempt_at.is_(None),
+            request_tracker.c.next_attempt_at <= now
+        )
+    )
+
+
+def count_claimable():
+    """
+    Number of unfinished requests that no worker currently holds a lease on.
+    """
+    session = SessionLocal()
+    try:
+        return session.execute(
+            select(func.count()).select_from(request_tracker).where(*_claimable(datetime.datetime.now()))
+        ).scalar()
+    finally:
+        session.close()
+
+
+def request_lane(request_data):
+    """
+    Lane of a new request: small verify requests are interactive, everything else is bulk.
+    """
+    header = request_data.get("header", {})
+    citizens = request_data.get("body", {}).get("citizens", [])
+    if header.get("request_type") == "verify" and len(citizens) <= JOB_INTERACTIVE_MAX_ROWS:
+        return INTERACTIVE_LANE
+    return BULK_LANE
+
+
+def _lane_column():
+    # Requests queued before lanes existed are treated as bulk
+    return func.coalesce(request_tracker.c.lane, BULK_LANE)
+
+
+def _running(session, now, tenant_id=None):
+    """
+    Requests currently leased by a worker, as {(tenant_id, lane): count}, optionally for one tenant.
+    """
+    conditions = [
+        request_tracker.c.status.not_in(TERMINAL_STATUSES),
+        request_tracker.c.lease_owner.is_not(None),
+        request_tracker.c.lease_expires_at >= now
+    ]
+    if tenant_id is not None:
+        conditions.append(request_tracker.c.tenant_id == tenant_id)
+    rows = session.execute(
+        select(request_tracker.c.tenant_id, _lane_column(), func.count())
+        .where(*conditions)
+        .group_by(request_tracker.c.tenant_id, _lane_column())
+    ).fetchall()
+    return {(tenant_id, lane): count for tenant_id, lane, count in rows}
+
+
+def _lock_tenant(session, tenant_id, lane):
+    """
+    Lock the tenant's ``tenant_claims`` row for ``lane`` until the transaction ends,
+    creating it on first use. Concurrent claims for the same tenant and lane wait here.
+    """
+    lock = (
+        select(tenant_claims.c.tenant_id)
+        .where(tenant_claims.c.tenant_id == tenant_id, tenant_claims.c.lane == lane)
+        .with_for_update()
+    )
+    if session.execute(lock).first() is not None:
+        return
+    try:
+        with session.begin_nested():
+            session.execute(tenant_claims.insert().values(tenant_id=tenant_id, lane=lane))
+    except IntegrityError:
+        # Created by a concurrent claim; wait for its lock
+        session.execute(lock)
+
+
+def _tenant_order(session, now, lane, running):
+    """
+    Tenants with claimable work in ``lane`` that are below their concurrency cap, least
+    served first: running requests divided by the tenant weight, then oldest waiting request.
+    """
+    waiting = session.execute(
+        select(request_tracker.c.tenant_id, func.min(request_tracker.c.created_at))
+        .where(*_claimable(now), _lane_column() == lane)
+        .group_by(request_tracker.c.tenant_id)
+    ).fetchall()
+
+    cap = LANE_TENANT_CAPS[lane]
+    eligible = []
+    for tenant_id, oldest in waiting:
+        if running.get((tenant_id, lane), 0) >= cap:
+            continue
+        tenant_running = sum(count for (tenant, _), count in running.items() if tenant == tenant_id)
+        share = tenant_running / TENANT_WEIGHTS.get(tenant_id, 1)
+        eligible.append((share, oldest or now, tenant_id))
+    return [tenant_id for _, _, tenant_id in sorted(eligible)]
+
+
+def retry_delay(attempts):
+    """
+    Seconds to wait after the ``attempts``-th failed attempt: JOB_RETRY_SECONDS, doubled
+    for every further attempt, up to JOB_RETRY_MAX_SECONDS.
+    """
+    return min(JOB_RETRY_SECONDS * 2 ** max(attempts - 1, 0), JOB_RETRY_MAX_SECONDS)
+
+
+def _dead_letter(session, row, error):
+    session.execute(
+        update(request_tracker)
+        .where(request_tracker.c.tenant_id == row["tenant_id"], request_tracker.c.request_id == row["request_id"])
+        .values(status=DEAD_LETTER, error=error[:255], lease_owner=None, lease_expires_at=None, next_attempt_at=None)
+    )
+    logger.error(f"Request {row['request_id']} moved to dead letter: {error}")
+
+
+def claim_next(owner, lanes=LANES):
+    """
+    Atomically claim the next request, trying ``lanes`` in order. Within a lane the least
+    served tenant below its concurrency cap goes first, and its oldest request is claimed.
+    Returns the claimed tracker row as a dict, or None when there is nothing to do.
+    """
+    now = datetime.datetime.now()
+    session = SessionLocal()
+    try:
+        running = _running(session, now)
+        for lane in lanes:
+            for tenant_id in _tenant_order(session, now, lane, running):
+                # The counts above were read without locks. Start a new transaction, so its
+                # reads see every claim committed before the tenant lock is granted, and
+                # re-check the cap under that lock
+                session.rollback()
+                _lock_tenant(session, tenant_id, lane)
+                if _running(session, now, tenant_id).get((tenant_id, lane), 0) >= LANE_TENANT_CAPS[lane]:
+                    session.rollback()
+                    continue
+
+                row = session.execute(
+                    select(request_tracker)
+                    .where(*_claimable(now), request_tracker.c.tenant_id == tenant_id, _lane_column() == lane)
+                    .order_by(request_tracker.c.created_at)
+                    .limit(1)
+                    .with_for_update(skip_locked=True)
+                ).mappings().first()
+                if row is None:
+                    session.rollback()
+                    continue
+
+                # Every earlier attempt was lost with its worker, so the request is
+                # probably what kills them
+                if (row["attempts"] or 0) >= JOB_MAX_ATTEMPTS:
+                    _dead_letter(session, row, f"Abandoned after {row['attempts']} attempts")
+                    session.commit()
+                    continue
+
+                # The lease condition is repeated so a claim can never succeed twice, even
+                # on a database that ignores SKIP LOCKED
+                claimed = session.execute(
+                    update(request_tracker)
+                    .where(
+                        request_tracker.c.tenant_id == row["tenant_id"],
+                        request_tracker.c.request_id == row["request_id"],
+                        *_claimable(now)
+                    )
+                    .values(
+                        lease_owner=owner,
+                        lease_expires_at=now + datetime.timedelta(seconds=JOB_LEASE_SECONDS),
+                        heartbeat_at=now,
+                        attempts=func.coalesce(request_tracker.c.attempts, 0) + 1,
+                        next_attempt_at=None
+                    )
+                ).rowcount
+                session.commit()
+                if claimed:
+                    logger.info(f"{owner} claimed {lane} request {row['request_id']} of tenant {tenant_id}")
+                    return dict(row)
+
+        session.rollback()
+        return None
+    finally:
+        session.close()
+
+
+def heartbeat(request_id, owner):
+    """
+    Extend the lease held by ``owner``. Returns False if the lease was lost to another worker.
+    """
+    now = datetime.datetime.now()
+    session = SessionLocal()
+    try:
+        result = session.execute(
+            update(request_tracker)
+            .where(request_tracker.c.request_id == request_id, request_tracker.c.lease_owner == owner)
+            .values(
+                lease_expires_at=now + datetime.timedelta(seconds=JOB_LEASE_SECONDS),
+                heartbeat_at=now
+            )
+        )
+        session.commit()
+        return result.rowcount > 0
+    finally:
+        session.close()
+
+
+def release(request_id, owner):
+    """
+    Give up the lease after a run. Unfinished requests are scheduled for another attempt
+    after their backoff, or dead-lettered once they have used up JOB_MAX_ATTEMPTS.
+    Returns the resulting status.
+    """
+    now = datetime.datetime.now()
+    session = SessionLocal()
+    try:
+        row = session.execute(
+            select(request_tracker).where(request_tracker.c.request_id == request_id)
+        ).mappings().first()
+        status = row["status"]
+        if row["lease_owner"] != owner:
+            # Another worker took the request over; its outcome is that worker's to record
+            session.rollback()
+            return status
+        attempts = row["attempts"] or 0
+        values = {"lease_owner": None, "lease_expires_at": None}
+        if status not in TERMINAL_STATUSES:
+            if attempts >= JOB_MAX_ATTEMPTS:
+                status = DEAD_LETTER
+                values["status"] = DEAD_LETTER
+                logger.error(f"Request {request_id} moved to dead letter after {attempts} attempts: {row['error']}")
+            else:
+                delay = retry_delay(attempts)
+                values["next_attempt_at"] = now + datetime.timedelta(seconds=delay)
+                logger.warning(f"Request {request_id} failed attempt {attempts}, retrying in {delay}s")
+        session.execute(
+            update(request_tracker)
+            .where(request_tracker.c.request_id == request_id, request_tracker.c.lease_owner == owner)
+            .values(**values)
+        )
+        session.commit()
+        return status
+    finally:
+        session.close()
+
+
+def _heartbeat_loop(request_id, owner, done, lease_lost):
+    while not done.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            if not heartbeat(request_id, owner):
+                # Tell the run to stop before it writes parts the new owner also writes
+                logger.warning(f"{owner} lost the lease on request {request_id}, stopping")
+                lease_lost.set()
+                return
+        except Exception as e:
+            logger.error(f"Heartbeat failed for request {request_id}: {str(e)}")
+
+
+async def run_claimed(job, owner):
+    """
+    Process a claimed request while heartbeating its lease, then release it.
+    Returns the request status after the run.
+    """
+    done = threading.Event()
+    lease_lost = threading.Event()
+    beat = threading.Thread(
+        target=_heartbeat_loop,
+        args=(job["request_id"], owner, done, lease_lost),
+        name=f"heartbeat-{job['request_id']}",
+        daemon=True
+    )
+    beat.start()
+    try:
+        await process_request(job, owner, lease_lost)
+    finally:
+        done.set()
+        beat.join()
+        status = release(job["request_id"], owner)
+    logger.info(f"{owner} finished request {job['request_id']} with status {status}")
+    return status
+
+
+def run_claimed_blocking(job, owner):
+    """
+    ``run_claimed`` on a fresh event loop, for worker threads and executors.
+    """
+    return asyncio.run(run_claimed(job, owner))
@@ -0,0 +1,303 @@
+"""
+In-process candidate generation index for probabilistic (demographic) citizen matching.
+
+Citizens are partitioned into blocks by (gender, caste, location). Inside each block the
+index keeps an inverted index from name trigrams to aadhars plus a Soundex key, so a
+query only scores citizens that share name fragments or sound alike, and typos anywhere
+in the name (including the first letter) still produce candidates. Gender and caste must
+match exactly and location is a prefix match, like the SQL fallback; locations are kept
+sorted per (gender, caste) so a prefix only visits the blocks it covers.
+
+Grams (and Soundex keys) with more than NAME_INDEX_MAX_POSTINGS postings in a block, such
+as those of very common names, are treated as stop-grams at query time: counting them would
+touch most of the block for little ranking value. A query left with nothing but stop-grams
+is answered by the SQL fallback instead.
+
+The index holds postings and the normalized name and age of each citizen, not the rows
+themselves; callers resolve the returned aadhars through the snapshot or MySQL. It is
+built and refreshed by the scheduler only. Until the first build finishes
+``get_name_index`` returns None and callers use SQL. Incremental refreshes cannot see
+deleted citizens, so the index is rebuilt from scratch every NAME_INDEX_REBUILD_HOURS.
+"""
+import bisect
+import heapq
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+
+from app.core.config import (
+    NAME_INDEX_NGRAM, NAME_INDEX_REBUILD_HOURS, NAME_INDEX_MAX_POSTINGS, NAME_MATCH_AGE_TOLERANCE
+)
+from app.services.citizen_snapshot import stream_citizen_rows
+from app.services.similarity import parse_age
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+BLOCK_FIELDS = ("gender", "caste", "location")
+PHONETIC_BONUS = 0.25
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+def normalize_name(name):
+    """
+    Lowercase, strip punctuation and collapse whitespace.
+    """
+    return re.sub(r"\s+", " ", re.sub(r"[^a-z0-9 ]", "", str(name or "").lower())).strip()
+
+
+def name_ngrams(name, n=NAME_INDEX_NGRAM):
+    """
+    Padded character n-grams of a normalized name.
+    """
+    padded = f"{' ' * (n - 1)}{name} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def soundex(name):
+    """
+    Classic four character Soundex key of the first word of a normalized name.
+    """
+    word = name.split(" ")[0] if name else ""
+    if not word:
+        return ""
+
+    key = word[0]
+    previous = _SOUNDEX_CODES.get(word[0], "")
+    for char in word[1:]:
+        code = _SOUNDEX_CODES.get(char, "")
+        if code and code != previous:
+            key += code
+        if char not in "hw":
+            previous = code
+    return (key + "000")[:4]
+
+
+def _block_value(value):
+    return str(value).strip().lower() if value else ""
+
+
+class _Block:
+    """
+    Postings for one (gender, caste, location) block.
+    """
+
+    def __init__(self):
+        self.grams = defaultdict(set)
+        self.phonetic = defaultdict(set)
+
+
+class _Entry:
+    """
+    What the index keeps per citizen: enough to score and to remove it again.
+    """
+
+    __slots__ = ("name", "age", "block_key", "gram_count")
+
+    def __init__(self, name, age, block_key, gram_count):
+        self.name = name
+        self.age = age
+        self.block_key = block_key
+        self.gram_count = gram_count
+
+
+class NameCandidateIndex:
+    """
+    Trigram + phonetic inverted index over citizen names, blocked by gender/caste/location.
+    Supports incremental ``add``/``remove`` and is safe to query from multiple threads.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        # (gender, caste) -> location -> _Block, plus the sorted locations for prefix lookups
+        self._blocks = defaultdict(dict)
+        self._locations = defaultdict(list)
+        self._lock = threading.RLock()
+        self.watermark = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _block_key(row):
+        return tuple(_block_value(row.get(field)) for field in BLOCK_FIELDS)
+
+    def add(self, row):
+        """
+        Index (or re-index) a citizen row keyed by its aadhar.
+        """
+        aadhar = str(row["aadhar"])
+        with self._lock:
+            if aadhar in self._entries:
+                self.remove(aadhar)
+
+            name = normalize_name(row.get("name"))
+            grams = name_ngrams(name)
+            block_key = self._block_key(row)
+            group, location = block_key[:2], block_key[2]
+            block = self._blocks[group].get(location)
+            if block is None:
+                block = self._blocks[group][location] = _Block()
+                bisect.insort(self._locations[group], location)
+            for gram in grams:
+                block.grams[gram].add(aadhar)
+            block.phonetic[soundex(name)].add(aadhar)
+
+            self._entries[aadhar] = _Entry(name, row.get("age"), block_key, len(grams))
+
+    def remove(self, aadhar):
+        """
+        Drop a citizen from the index if present.
+        """
+        aadhar = str(aadhar)
+        with self._lock:
+            entry = self._entries.pop(aadhar, None)
+            if entry is None:
+                return
+
+            group, location = entry.block_key[:2], entry.block_key[2]
+            block = self._blocks[group][location]
+            for gram in name_ngrams(entry.name):
+                block.grams[gram].discard(aadhar)
+                if not block.grams[gram]:
+                    del block.grams[gram]
+            key = soundex(entry.name)
+            block.phonetic[key].discard(aadhar)
+            if not block.phonetic[key]:
+                del block.phonetic[key]
+            if not block.grams:
+                del self._blocks[group][location]
+                locations = self._locations[group]
+                del locations[bisect.bisect_left(locations, location)]
+                if not locations:
+                    del self._blocks[group]
+                    del self._locations[group]
+
+    def update(self, rows):
+        """
+        Apply a batch of new or modified citizen rows.
+        """
+        count = 0
+        with self._lock:
+            for row in rows:
+                modified_on = row.pop("modified_on", None)
+                if modified_on is not None and (self.watermark is None or modified_on > self.watermark):
+                    self.watermark = modified_on
+                self.add(row)
+                count += 1
+        return count
+
+    def _matching_blocks(self, citizen):
+        gender, caste, location = (_block_value(citizen.get(field)) for field in BLOCK_FIELDS)
+        if gender and caste:
+            groups = [(gender, caste)] if (gender, caste) in self._blocks else []
+        else:
+            # Few (gender, caste) pairs exist, so an unconstrained one is a short scan
+            groups = [
+                group for group in self._blocks
+                if (not gender or group[0] == gender) and (not caste or group[1] == caste)
+            ]
+
+        for group in groups:
+            blocks = self._blocks[group]
+            if not location:
+                yield from blocks.values()
+                continue
+            locations = self._locations[group]
+            position = bisect.bisect_left(locations, location)
+            while position < len(locations) and locations[position].startswith(location):
+                yield blocks[locations[position]]
+                position += 1
+
+    def candidates(self, citizen, k):
+        """
+        Return the aadhars of up to ``k`` citizens ranked by name trigram overlap (Jaccard)
+        with a bonus for a matching Soundex key. Gender/caste/location restrict the searched
+        blocks and age, when present, must be within NAME_MATCH_AGE_TOLERANCE years.
+        Returns None when every posting list the query needs is over NAME_INDEX_MAX_POSTINGS.
+        """
+        name = normalize_name(citizen.get("name"))
+        if not name:
+            return []
+
+        query_grams = name_ngrams(name)
+        phonetic_key = soundex(name)
+        age = parse_age(citizen.get("age"))
+
+        with self._lock:
+            shared = Counter()
+            phonetic_hits = set()
+            skipped = False
+            for block in self._matching_blocks(citizen):
+                for gram in query_grams:
+                    postings = block.grams.get(gram, ())
+                    if len(postings) > NAME_INDEX_MAX_POSTINGS:
+                        skipped = True
+                    else:
+                        shared.update(postings)
+                postings = block.phonetic.get(phonetic_key, ())
+                if len(postings) > NAME_INDEX_MAX_POSTINGS:
+                    skipped = True
+                else:
+                    phonetic_hits.update(postings)
+
+            if skipped and not shared and not phonetic_hits:
+                logger.debug(f"Only stop-grams for name '{name}', leaving it to the SQL fallback")
+                return None
+
+            scored = []
+            for aadhar in shared.keys() | phonetic_hits:
+                entry = self._entries[aadhar]
+                if age is not None and entry.age is not None and abs(entry.age - age) > NAME_MATCH_AGE_TOLERANCE:
+                    continue
+                overlap = shared.get(aadhar, 0)
+                score = overlap / (len(query_grams) + entry.gram_count - overlap)
+                if aadhar in phonetic_hits:
+                    score += PHONETIC_BONUS
+                scored.append((score, aadhar))
+
+            return [aadhar for _, aadhar in heapq.nlargest(k, scored)]
+
+
+_index_lock = threading.Lock()
+_index = None
+_built_at = None
+
+
+def refresh_name_index():
+    """
+    Build the process-wide index on first use or once it is NAME_INDEX_REBUILD_HOURS old,
+    otherwise apply rows modified since its watermark. Queries keep using the previous
+    index while a new one is built.
+    """
+    global _index, _built_at
+    with _index_lock:
+        rebuild_due = _built_at is not None and time.monotonic() - _built_at >= NAME_INDEX_REBUILD_HOURS * 3600
+        if _index is None or rebuild_due:
+            index = NameCandidateIndex()
+            count = index.update(stream_citizen_rows())
+            _index, _built_at = index, time.monotonic()
+            logger.info(f"Built name candidate index with {count} citizens")
+        else:
+            count = _index.update(stream_citizen_rows(_index.watermark))
+            logger.info(f"Refreshed name candidate index with {count} modified citizens")
+        return _index
+
+
+def get_name_index():
+    """
+    Return the process-wide name candidate index, or None until the scheduler has built it.
+    """
+    return _index
@@ -0,0 +1,65 @@
+"""
+Staged writer for result parts.
+
+The caller keeps fetching rows while a bounded thread pool serializes, encrypts and
+atomically writes earlier parts. Parts complete out of order on the pool, but their
+checkpoints are handed back strictly in part order and only once the file is durable,
+so a crash can never checkpoint past a part that is missing on disk.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.common import encrypt_and_save_to_file
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class PartPipeline:
+    """
+    Bounded pipeline: at most ``depth`` parts are in flight. ``on_durable(checkpoint, file_info)``
+    is called on the submitting thread, in submission order, after each part is on disk;
+    ``file_info`` is the byte size and checksum returned by the writer.
+    """
+
+    def __init__(self, workers, depth, on_durable):
+        self.depth = depth
+        self.on_durable = on_durable
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="part-writer")
+        self.pending = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # Don't start parts that were queued behind a failure
+            for future, _ in self.pending:
+                future.cancel()
+        self.executor.shutdown(wait=True)
+        return False
+
+    def _complete_head(self):
+        future, checkpoint = self.pending.popleft()
+        self.on_durable(checkpoint, future.result())
+
+    def submit(self, data, result_file, checkpoint):
+        """
+        Queue a part for writing. Blocks only while ``depth`` parts are already in flight.
+        """
+        self.pending.append((self.executor.submit(encrypt_and_save_to_file, data, result_file), checkpoint))
+
+        # Release checkpoints for every finished part at the head of the queue
+        while self.pending and self.pending[0][0].done():
+            self._complete_head()
+        while len(self.pending) >= self.depth:
+            self._complete_head()
+
+    def drain(self):
+        """
+        Wait for every queued part and release their checkpoints.
+        """
+        while self.pending:
+            self._complete_head()
@@ -0,0 +1,198 @@
+"""
+Registry of result parts, one row per written part.
+
+Parts are recorded in the ``result_parts`` table together with a compact summary
+(part count, rows, bytes) on ``request_tracker``, instead of rewriting the whole
+``files`` JSON array after every part. Status queries page through the registry.
+"""
+import datetime
+import json
+
+from sqlalchemy import delete, func, insert, select, update
+
+from app.db.models import SessionLocal, request_tracker, result_parts
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class LeaseLost(Exception):
+    """
+    Raised when a worker finds that another worker has taken over its request.
+    """
+
+
+def part_path(request_id, part):
+    """
+    Public results path of a part, as served by the results route.
+    """
+    return f"/results/{request_id}/{part}.json"
+
+
+def record_part(request_id, part, row_count, file_info, owner=None, **checkpoint):
+    """
+    Register a durable part and advance the tracker summary and checkpoint in one transaction.
+    ``checkpoint`` holds extra request_tracker values such as last_processed_index.
+    With ``owner`` the update only applies while that worker still holds the lease, and
+    LeaseLost is raised otherwise.
+    """
+    session = SessionLocal()
+    try:
+        # A part rewritten after a crash replaces its earlier registration, so only the
+        # difference to that registration is added to the summary
+        previous = session.execute(
+            select(result_parts.c.row_count, result_parts.c.byte_size)
+            .where(result_parts.c.request_id == request_id, result_parts.c.part == part)
+            .with_for_update()
+        ).fetchone()
+        previous_rows = (previous.row_count or 0) if previous else 0
+        previous_bytes = (previous.byte_size or 0) if previous else 0
+        session.execute(
+            delete(result_parts)
+            .where(result_parts.c.request_id == request_id, result_parts.c.part == part)
+        )
+        session.execute(
+            insert(result_parts).values(
+                request_id=request_id,
+                part=part,
+                path=part_path(request_id, part),
+                row_count=row_count,
+                byte_size=file_info["byte_size"],
+                checksum=file_info["checksum"],
+                created_at=datetime.datetime.now()
+            )
+        )
+        conditions = [request_tracker.c.request_id == request_id]
+        if owner is not None:
+            conditions.append(request_tracker.c.lease_owner == owner)
+        updated = session.execute(
+            update(request_tracker)
+            .where(*conditions)
+            .values(
+                part_count=part,
+                result_rows=func.coalesce(request_tracker.c.result_rows, 0) + row_count - previous_rows,
+                result_bytes=func.coalesce(request_tracker.c.result_bytes, 0) + file_info["byte_size"] - previous_bytes,
+                **checkpoint
+            )
+        ).rowcount
+        if owner is not None and not updated:
+            session.rollback()
+            raise LeaseLost(f"{owner} no longer holds the lease on request {request_id}")
+        session.commit()
+    finally:
+        session.close()
+    logger.debug(f"Registered part {part} of request {request_id} with {row_count} rows")
+
+
+def link_parts(request_id, source_request_id, summary):
+    """
+    Register every part of ``source_request_id`` for ``request_id`` by reference, without
+    copying files, and set the tracker summary. Used to serve a cached search result.
+    """
+    session = SessionLocal()
+    try:
+        session.execute(delete(result_parts).where(result_parts.c.request_id == request_id))
+        source_parts = session.execute(
+            select(result_parts).where(result_parts.c.request_id == source_request_id)
+        ).mappings().all()
+        now = datetime.datetime.now()
+        if source_parts:
+            session.execute(
+                insert(result_parts),
+                [
+                    {
+                        "request_id": request_id,
+                        "part": part["part"],
+                        "path": part_path(request_id, part["part"]),
+                        "row_count": part["row_count"],
+                        "byte_size": part["byte_size"],
+                        "checksum": part["checksum"],
+                        "created_at": now,
+                        # Follow references so a hit on a cached hit still points at the files
+                        "source_request_id": part["source_request_id"] or source_request_id
+                    }
+                    for part in source_parts
+                ]
+            )
+        session.execute(
+            update(request_tracker)
+            .where(request_tracker.c.request_id == request_id)
+            .values(
+                part_count=summary["parts"],
+                result_rows=summary["rows"],
+                result_bytes=summary["bytes"]
+            )
+        )
+        session.commit()
+    finally:
+        session.close()
+    logger.info(f"Linked {len(source_parts)} parts of request {source_request_id} to request {request_id}")
+
+
+def part_source(request_id, part):
+    """
+    Request whose result directory holds the part file, or None if it is the request's own.
+    """
+    session = SessionLocal()
+    try:
+        return session.execute(
+            select(result_parts.c.source_request_id)
+            .where(result_parts.c.request_id == request_id, result_parts.c.part == part)
+        ).scalar()
+    finally:
+        session.close()
+
+
+def reset_parts(request_id):
+    """
+    Forget every registered part of a request, for runs that restart from scratch.
+    """
+    session = SessionLocal()
+    try:
+        session.execute(delete(result_parts).where(result_parts.c.request_id == request_id))
+        session.execute(
+            update(request_tracker)
+            .where(request_tracker.c.request_id == request_id)
+            .values(part_count=0, result_rows=0, result_bytes=0, files=json.dumps([]))
+        )
+        session.commit()
+    finally:
+        session.close()
+
+
+def list_parts(request_id, offset=0, limit=None):
+    """
+    Return a page of registered parts for a request, ordered by part number.
+    """
+    query = (
+        select(result_parts)
+        .where(result_parts.c.request_id == request_id)
+        .order_by(result_parts.c.part)
+        .offset(offset)
+    )
+    if limit is not None:
+        query = query.limit(limit)
+
+    session = SessionLocal()
+    try:
+        return session.execute(query).mappings().all()
+    finally:
+        session.close()
+
+
+def summarize(status_record):
+    """
+    Compact part summary of a tracker row. Requests written before the registry existed
+    only have the legacy ``files`` JSON array, which is used as a fallback.
+    """
+    files = json.loads(status_record.files) if status_record.files else []
+    if files and not status_record.part_count:
+        return {"parts": len(files), "rows": None, "bytes": None, "legacy_files": files}
+
+    return {
+        "parts": status_record.part_count or 0,
+        "rows": status_record.result_rows or 0,
+        "bytes": status_record.result_bytes or 0
+    }
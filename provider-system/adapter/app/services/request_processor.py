@@ -4,13 +4,31 @@ Service for processing data exchange requests in the Provider adapter.
 import json
 import uuid
 import datetime
+import itertools
 
+import pymysql
 from pathlib import Path
 from sqlalchemy import select, update
 
 from app.db.models import SessionLocal, request_tracker
-from app.db.session import get_db_connection
-from app.core.config import RESULTS_DIR, BATCH_SIZE
+from app.db.session import db_connection
+from app.core.config import (
+    RESULTS_DIR, BATCH_SIZE, VERIFY_LOOKUP_CHUNK_SIZE, CITIZEN_SNAPSHOT_ENABLED,
+    NAME_INDEX_ENABLED, NAME_CANDIDATES_TOP_K, NAME_MATCH_AGE_TOLERANCE,
+    SEARCH_PIPELINE_WORKERS, SEARCH_PIPELINE_DEPTH, SEARCH_EXPLAIN_ENABLED, SEARCH_CACHE_ENABLED,
+    SEARCH_FROM_SNAPSHOT
+)
+from app.services.citizen_snapshot import compile_snapshot_criteria, evaluate_criteria, get_snapshot
+from app.services.criteria import InvalidCriteriaError, compile_criteria
+from app.services.index_advisor import record_criteria_usage, warn_on_full_scan
+from app.services.name_index import get_name_index, parse_age
+from app.services.part_pipeline import PartPipeline
+from app.services import search_cache
+from app.services.part_registry import LeaseLost, link_parts, record_part, reset_parts
+from app.services.search_cache import cache_key, citizens_fingerprint
+from app.services.search_query import SEARCH_RESULT_COLUMNS, build_search_query, to_pymysql
+from app.services.similarity import best_matches, capped_score, is_match
+from app.utils.common import part_file_path
 
 
 from app.core.logger import get_logger
@@ -18,31 +36,234 @@ from app.core.logger import get_logger
 logger = get_logger(__name__)
 
 
-def calculate_string_similarity(str1, str2):
+# MySQL errors that mean the query itself is wrong, such as an unknown column
+PERMANENT_MYSQL_ERRORS = {1054, 1064, 1146}
+
+
+def check_lease(lease_lost):
     """
-    Calculate a simple string similarity score (0.0 to 1.0).
+    Stop a run whose lease was taken over by another worker.
     """
-    if not str1 or not str2:
-        return 0.0
-    
-    str1 = str1.lower()
-    str2 = str2.lower()
-    
-    # If strings are identical
-    if str1 == str2:
-        return 1.0
-    
-    # Compute Levenshtein distance (simplified approach)
-    distance = sum(c1 != c2 for c1, c2 in zip(str1, str2)) + abs(len(str1) - len(str2))
-    max_len = max(len(str1), len(str2))
-    
-    # Convert to similarity score
-    similarity = 1.0 - (distance / max_len)
-    return max(0.0, similarity)
+    if lease_lost is not None and lease_lost.is_set():
+        raise LeaseLost("Lease lost to another worker")
+
+
+def failure_status(error):
+    """
+    Tracker status of a failed run. Only errors known to fail the same way on every retry
+    (invalid criteria, the MySQL errors in PERMANENT_MYSQL_ERRORS) go straight to
+    ``dead_letter``; anything else is retried until JOB_MAX_ATTEMPTS.
+    """
+    if isinstance(error, InvalidCriteriaError):
+        return "dead_letter"
+    if isinstance(error, pymysql.err.MySQLError) and error.args and error.args[0] in PERMANENT_MYSQL_ERRORS:
+        return "dead_letter"
+    return "failed"
+
+
+def find_name_candidates(connection, citizen, k):
+    """
+    Return up to k candidate rows for a citizen without an aadhar using a blocked SQL query.
+    """
+    with connection.cursor() as cursor:
+        # Build a query based on attributes
+        query_parts = []
+        params = []
+        
+        if "name" in citizen and citizen["name"]:
+            query_parts.append("name LIKE %s")
+            params.append(f"{citizen['name']}%")
+        
+        # Ages arrive as JSON and may be strings; an unusable age does not filter at all
+        age = parse_age(citizen.get("age"))
+        if age is not None:
+            # A range on the bare column can use an index, unlike ABS(age - x) <= tolerance
+            query_parts.append("age BETWEEN %s AND %s")
+            params.extend([age - NAME_MATCH_AGE_TOLERANCE, age + NAME_MATCH_AGE_TOLERANCE])
+        
+        if "gender" in citizen and citizen["gender"]:
+            query_parts.append("gender = %s")
+            params.append(citizen["gender"])
+        
+        if "caste" in citizen and citizen["caste"]:
+            query_parts.append("caste = %s")
+            params.append(citizen["caste"])
+        
+        if "location" in citizen and citizen["location"]:
+            query_parts.append("location LIKE %s")
+            params.append(f"{citizen['location']}%")
+        
+        if not query_parts:
+            return []
+
+        query = f"SELECT * FROM citizens WHERE {' AND '.join(query_parts)} LIMIT %s"
+        cursor.execute(query, params + [k])
+        return cursor.fetchall()
+
+def find_all_name_candidates(connection, citizens, k):
+    """
+    Return up to k candidate rows for each citizen without an aadhar. Uses the in-process
+    name index once it is built, resolving all of its hits with one bulk aadhar lookup, and
+    the SQL query otherwise or for names made only of the index's stop-grams.
+    """
+    index = get_name_index() if NAME_INDEX_ENABLED else None
+    if index is None:
+        return [find_name_candidates(connection, citizen, k) for citizen in citizens]
+
+    ranked = [index.candidates(citizen, k) if citizen.get("name") else None for citizen in citizens]
+    rows = fetch_citizens_by_aadhar(connection, [aadhar for aadhars in ranked if aadhars for aadhar in aadhars])
+    # A hit deleted since the last index refresh has no row and is skipped
+    return [
+        [rows[aadhar] for aadhar in aadhars if aadhar in rows] if aadhars is not None
+        else find_name_candidates(connection, citizen, k)
+        for citizen, aadhars in zip(citizens, ranked)
+    ]
+
+def fetch_citizens_by_aadhar(connection, aadhars):
+    """
+    Fetch citizens for a list of aadhar numbers using bulk IN-list queries.
+    Returns a dict keyed by aadhar; aadhars without a match are absent.
+    """
+    matched = {}
+    unique_aadhars = list(dict.fromkeys(str(aadhar) for aadhar in aadhars))
+
+    # Serve what we can from the memory-mapped snapshot. Rows changed since its last refresh
+    # are served as of that refresh; only aadhars missing from the snapshot go to MySQL.
+    snapshot = get_snapshot() if CITIZEN_SNAPSHOT_ENABLED else None
+    if snapshot is not None:
+        matched.update(snapshot.lookup(unique_aadhars))
+    remaining = [aadhar for aadhar in unique_aadhars if aadhar not in matched]
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(remaining), VERIFY_LOOKUP_CHUNK_SIZE):
+            chunk = remaining[start:start + VERIFY_LOOKUP_CHUNK_SIZE]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"SELECT * FROM citizens WHERE aadhar IN ({placeholders})", chunk)
+            for row in cursor.fetchall():
+                matched[str(row["aadhar"])] = row
+
+    logger.debug(f"Resolved {len(matched)} of {len(unique_aadhars)} aadhars in bulk")
+    return matched
+
+def load_checkpoint(request_id):
+    """
+    Return (last_processed_index, part_count, last_aadhar) recorded for a request by a previous run.
+    Requests checkpointed before the part registry existed fall back to their files JSON.
+    """
+    last_index = 0
+    part_count = 0
+    last_aadhar = None
+
+    session = SessionLocal()
+    result = session.execute(
+        select(
+            request_tracker.c.last_processed_index,
+            request_tracker.c.part_count,
+            request_tracker.c.files,
+            request_tracker.c.last_aadhar
+        )
+        .where(request_tracker.c.request_id == request_id)
+    ).fetchone()
+    session.close()
+
+    if result:
+        if result[0] is not None:
+            last_index = result[0]
+        if result[1]:
+            part_count = result[1]
+        elif result[2]:
+            try:
+                part_count = len(json.loads(result[2]))
+            except json.JSONDecodeError:
+                part_count = 0
+        last_aadhar = result[3]
+
+    return last_index, part_count, last_aadhar
+
+def has_aadhar(citizen):
+    """
+    Whether a submitted citizen can be matched exactly by aadhar.
+    """
+    return bool(citizen.get("aadhar"))
+
+def verify_citizens(connection, citizens, predicate):
+    """
+    Match a batch of citizens and evaluate the compiled criteria on every matched row.
+    Returns one result per citizen, in input order.
+    """
+    matched_by_aadhar = fetch_citizens_by_aadhar(
+        connection,
+        [c["aadhar"] for c in citizens if has_aadhar(c)]
+    )
 
-async def process_request(request_data):
+    # Score every demographic citizen against its top-k candidates at once
+    demographic = [c for c in citizens if not has_aadhar(c)]
+    best = iter(best_matches(
+        demographic,
+        find_all_name_candidates(connection, demographic, NAME_CANDIDATES_TOP_K)
+    ))
+
+    # Pair each citizen with its match, then evaluate criteria for all matched rows in one pass
+    matches = []
+    for citizen in citizens:
+        if has_aadhar(citizen):
+            # Scenario 1: Match by aadhar (match_score = 1.00)
+            matched_citizen = matched_by_aadhar.get(str(citizen["aadhar"]))
+            matches.append((citizen, matched_citizen, 1.00 if matched_citizen else 0.00))
+        else:
+            # Scenario 2: Probabilistic matching, best of the top-k candidates
+            matches.append((citizen, *next(best)))
+
+    qualified = [
+        matched_citizen for citizen, matched_citizen, match_score in matches
+        if matched_citizen and (has_aadhar(citizen) or is_match(match_score))
+    ]
+    criteria_results = iter(evaluate_criteria(predicate, qualified))
+
+    results = []
+    for citizen, matched_citizen, match_score in matches:
+        if has_aadhar(citizen):
+            if matched_citizen:
+                # Add to results with match_score = 1.00
+                results.append({
+                    "aadhar": citizen["aadhar"],
+                    "criteria_results": next(criteria_results),
+                    "match_score": 1.00
+                })
+            else:
+                # No match found
+                results.append({
+                    "aadhar": citizen["aadhar"],
+                    "criteria_results": [],
+                    "match_score": 0.00
+                })
+        elif matched_citizen and is_match(match_score):
+            # Add to results with calculated match_score (but less than 1.00)
+            results.append({
+                "name": citizen.get("name", ""),
+                "age": citizen.get("age", 0),
+                "gender": citizen.get("gender", ""),
+                "caste": citizen.get("caste", ""),
+                "location": citizen.get("location", ""),
+                "criteria_results": next(criteria_results),
+                "match_score": capped_score(match_score)  # Cap at 0.99 to indicate probabilistic
+            })
+        else:
+            # Match score too low, or no match found
+            results.append({
+                "name": citizen.get("name", ""),
+                "age": citizen.get("age", 0),
+                "gender": citizen.get("gender", ""),
+                "criteria_results": [],
+                "match_score": match_score
+            })
+    return results
+
+async def process_request(request_data, owner=None, lease_lost=None):
     """
     Processes a request based on its type (verify or search).
+    A worker passes its lease ``owner`` and a ``lease_lost`` event that is set when the
+    lease is taken over; the run then stops at the next part without registering it.
     """
     logger.info("Processing request")
     try:
@@ -52,9 +273,9 @@ async def process_request(request_data):
         
         request_type = header["request_type"]        
         if request_type == "verify":
-            await process_verify_request(request_data)
+            await process_verify_request(request_data, owner, lease_lost)
         elif request_type == "search":
-            await process_search_request(request_data)
+            await process_search_request(request_data, owner, lease_lost)
         else:
             logger.error(f"Unknown request type: {request_type}")
     
@@ -72,7 +293,7 @@ async def process_request(request_data):
         }
     }
 
-async def process_verify_request(request_data):
+async def process_verify_request(request_data, owner=None, lease_lost=None):
     """
     Processes an inclusion request (verifying citizens against criteria).
     """
@@ -102,207 +323,67 @@ async def process_verify_request(request_data):
         citizens = body.get("citizens", [])
         criteria = body.get("criteria", [])
         
-        # Process citizens
-        results = []
-        
-        # Connect to the database
-        connection = get_db_connection()
+        # Compile the criteria once for the whole request
+        predicate = compile_criteria(criteria)
         
-        for citizen in citizens:
-            # Determine matching strategy
-            if "aadhar" in citizen and citizen["aadhar"]:
-                # Scenario 1: Match by aadhar (match_score = 1.00)
-                with connection.cursor() as cursor:
-                    # Query Provider ration database for matching citizen
-                    cursor.execute(f"SELECT * FROM citizens WHERE aadhar = %s", (citizen["aadhar"],))
-                    matched_citizen = cursor.fetchone()
-                    
-                    if matched_citizen:
-                        # Evaluate criteria
-                        criteria_results = []
-                        for criterion in criteria:
-                            field = criterion["field"]
-                            operator = criterion["operator"]
-                            value = criterion["value"]
-                            
-                            # Check if the field exists in the matched citizen
-                            if field in matched_citizen:
-                                match = False
-                                
-                                # Evaluate based on operator
-                                if operator == "=":
-                                    if isinstance(matched_citizen[field], str) and isinstance(value, str):
-                                        match = matched_citizen[field].lower() == value.lower()
-                                    else:
-                                        match = matched_citizen[field] == value
-                                elif operator == ">":
-                                    match = matched_citizen[field] > value
-                                elif operator == "<":
-                                    match = matched_citizen[field] < value
-                                
-                                criteria_results.append({
-                                    "field": field,
-                                    "match": match
-                                })
-                        
-                        # Add to results with match_score = 1.00
-                        results.append({
-                            "aadhar": citizen["aadhar"],
-                            "criteria_results": criteria_results,
-                            "match_score": 1.00
-                        })
-                    else:
-                        # No match found
-                        results.append({
-                            "aadhar": citizen["aadhar"],
-                            "criteria_results": [],
-                            "match_score": 0.00
-                        })
-            else:
-                # Scenario 2: Probabilistic matching
-                with connection.cursor() as cursor:
-                    # Build a query based on attributes
-                    query_parts = []
-                    params = []
-                    
-                    if "name" in citizen and citizen["name"]:
-                        query_parts.append("name LIKE %s")
-                        params.append(f"{citizen['name']}%")
-                    
-                    if "age" in citizen and citizen["age"]:
-                        query_parts.append("ABS(age - %s) <= 2")
-                        params.append(citizen["age"])
-                    
-                    if "gender" in citizen and citizen["gender"]:
-                        query_parts.append("gender = %s")
-                        params.append(citizen["gender"])
-                    
-                    if "caste" in citizen and citizen["caste"]:
-                        query_parts.append("caste = %s")
-                        params.append(citizen["caste"])
-                    
-                    if "location" in citizen and citizen["location"]:
-                        query_parts.append("location LIKE %s")
-                        params.append(f"{citizen['location']}%")
-                    
-                    if query_parts:
-                        query = f"SELECT * FROM citizens WHERE {' AND '.join(query_parts)} LIMIT 1"
-                        cursor.execute(query, params)
-                        matched_citizen = cursor.fetchone()
-                        
-                        if matched_citizen:
-                            # Calculate match score based on fields
-                            match_score = 0.0
-                            
-                            # Name match (50%)
-                            if "name" in citizen and "name" in matched_citizen:
-                                name_similarity = calculate_string_similarity(
-                                    citizen["name"], matched_citizen["name"]
-                                )
-                                match_score += 0.5 * name_similarity
-                            
-                            # Age match (30%)
-                            if "age" in citizen and "age" in matched_citizen:
-                                age_diff = abs(citizen["age"] - matched_citizen["age"])
-                                age_similarity = max(0, 1 - (age_diff / 10))  # Allow up to 10 years difference
-                                match_score += 0.3 * age_similarity
-                            
-                            # Gender match (20%)
-                            if "gender" in citizen and "gender" in matched_citizen:
-                                gender_match = 1 if citizen["gender"].lower() == matched_citizen["gender"].lower() else 0
-                                match_score += 0.2 * gender_match
-                            
-                            # Only consider matches with score > 0.8
-                            if match_score > 0.8:
-                                # Evaluate criteria
-                                criteria_results = []
-                                for criterion in criteria:
-                                    field = criterion["field"]
-                                    operator = criterion["operator"]
-                                    value = criterion["value"]
-                                    
-                                    if field in matched_citizen:
-                                        match = False
-                                        
-                                        if operator == "=":
-                                            if isinstance(matched_citizen[field], str) and isinstance(value, str):
-                                                match = matched_citizen[field].lower() == value.lower()
-                                            else:
-                                                match = matched_citizen[field] == value
-                                        elif operator == ">":
-                                            match = matched_citizen[field] > value
-                                        elif operator == "<":
-                                            match = matched_citizen[field] < value
-                                        
-                                        criteria_results.append({
-                                            "field": field,
-                                            "match": match
-                                        })
-                                
-                                # Add to results with calculated match_score (but less than 1.00)
-                                results.append({
-                                    "name": citizen.get("name", ""),
-                                    "age": citizen.get("age", 0),
-                                    "gender": citizen.get("gender", ""),
-                                    "caste": citizen.get("caste", ""),
-                                    "location": citizen.get("location", ""),
-                                    "criteria_results": criteria_results,
-                                    "match_score": min(0.99, match_score)  # Cap at 0.99 to indicate probabilistic
-                                })
-                            else:
-                                # Match score too low
-                                results.append({
-                                    "name": citizen.get("name", ""),
-                                    "age": citizen.get("age", 0),
-                                    "gender": citizen.get("gender", ""),
-                                    "criteria_results": [],
-                                    "match_score": match_score
-                                })
-                        else:
-                            # No match found
-                            results.append({
-                                "name": citizen.get("name", ""),
-                                "age": citizen.get("age", 0),
-                                "gender": citizen.get("gender", ""),
-                                "criteria_results": [],
-                                "match_score": 0.00
-                            })
+        # Resume from the last completed part, if a previous run got that far
+        last_index, part_count, _ = load_checkpoint(request_id)
+        logger.info(f"Resuming from last_processed_index: {last_index}, existing parts: {part_count}")
         
-        connection.close()
+        # Write results in parts of BATCH_SIZE as they are produced, so memory stays flat
+        from app.utils.common import encrypt_and_save_to_file
+        file_index = part_count + 1
+        part_starts = list(range(last_index, len(citizens), BATCH_SIZE))
+        if not citizens and not part_count:
+            part_starts = [0]
         
-        # Prepare response
-        response_data = {
-            "header": {
-                "request_id": request_id,
-                "request_type": "verify",
-                "tenant_id": tenant_id,
-                "timestamp": datetime.datetime.now().isoformat(),
-                "status": "completed",
-                "part": 1,
-                "has_more_parts": False
-            },
-            "body": {
-                "results": results
-            }
-        }
+        # Connect to the database; a connection that failed mid-request is not reused
+        with db_connection() as connection:
+            for start in part_starts:
+                check_lease(lease_lost)
+                part_citizens = citizens[start:start + BATCH_SIZE]
+            
+                # Resolve matches one chunk at a time instead of one query per citizen
+                results = []
+                for chunk_start in range(0, len(part_citizens), VERIFY_LOOKUP_CHUNK_SIZE):
+                    chunk = part_citizens[chunk_start:chunk_start + VERIFY_LOOKUP_CHUNK_SIZE]
+                    results.extend(verify_citizens(connection, chunk, predicate))
+            
+                # Prepare response for this part; the part count is known up front
+                response_data = {
+                    "header": {
+                        "request_id": request_id,
+                        "request_type": "verify",
+                        "tenant_id": tenant_id,
+                        "timestamp": datetime.datetime.now().isoformat(),
+                        "status": "completed",
+                        "part": file_index,
+                        "has_more_parts": start + BATCH_SIZE < len(citizens)
+                    },
+                    "body": {
+                        "results": results
+                    }
+                }
+            
+                # Encrypt and save to file
+                result_file = part_file_path(result_dir, file_index)
+                file_info = encrypt_and_save_to_file(response_data, result_file)
+                logger.info(f"Written result file: {result_file} with {len(results)} records")
+            
+                # Register the part and checkpoint progress as soon as it lands
+                record_part(
+                    request_id, file_index, len(results), file_info, owner=owner,
+                    last_processed_index=start + len(part_citizens)
+                )
+                file_index += 1
         
-        # Save results to file
-        result_file = result_dir / "1.json"
-
-        # Encrypt and save to file
-        from app.utils.common import encrypt_and_save_to_file
-        encrypt_and_save_to_file(response_data, result_file)
-        logger.info(f"Written result file: {result_file} with records")
-
-
-        # Update tracker with completed status and file list
+        # Update tracker with completed status (parts already registered)
         session = SessionLocal()
         session.execute(
             update(request_tracker)
             .where(request_tracker.c.request_id == request_id)
             .values(
-                status="completed",
-                files=json.dumps([f"/results/{request_id}/1.json"])
+                status="completed"
             )
         )
         session.commit()
@@ -310,6 +391,9 @@ async def process_verify_request(request_data):
         
         logger.info(f"verify request {request_id} processed successfully")
         
+    except LeaseLost as e:
+        # The worker that took over owns the tracker row now
+        logger.warning(f"Stopped verify request {request_id}: {str(e)}")
     except Exception as e:
         logger.error(f"Error processing verify request: {str(e)}")
         
@@ -319,14 +403,14 @@ async def process_verify_request(request_data):
             update(request_tracker)
             .where(request_tracker.c.request_id == request_id)
             .values(
-                status="failed",
-                error=str(e)
+                status=failure_status(e),
+                error=str(e)[:255]
             )
         )
         session.commit()
         session.close()
 
-async def process_search_request(request_data):
+async def process_search_request(request_data, owner=None, lease_lost=None):
     """
     Processes an search_jobs request (searching for citizens matching criteria).
     """
@@ -355,132 +439,134 @@ async def process_search_request(request_data):
         # Extract criteria
         criteria = body.get("criteria", [])
         
-        # Connect to the database
-        connection = get_db_connection()
-        cursor = connection.cursor()
-        
-        # Build SQL query based on criteria
-        query_parts = []
-        params = []
-        
-        for criterion in criteria:
-            field = criterion["field"]
-            operator = criterion["operator"]
-            value = criterion["value"]
-            
-            if operator == "=":
-                query_parts.append(f"{field} = %s")
-            elif operator == ">":
-                query_parts.append(f"{field} > %s")
-            elif operator == "<":
-                query_parts.append(f"{field} < %s")
-            
-            params.append(value)
-        
-        where_clause = " AND ".join(query_parts) if query_parts else "1=1"
-        query = f"SELECT name, aadhar, phone_number FROM citizens WHERE {where_clause}"
-        
-        # Fetch last processed index from request_tracker
-        last_index = 0
-        files = []
-
-        session = SessionLocal()
-        result = session.execute(
-            select(request_tracker.c.last_processed_index, request_tracker.c.files)
-            .where(request_tracker.c.request_id == request_id)
-        ).fetchone()
-        session.close()
+        # Fetch last processed index and aadhar from request_tracker
+        last_index, part_count, last_aadhar = load_checkpoint(request_id)
+        if last_index > 0 and last_aadhar is None:
+            # Checkpoint written by the old positional resume; it cannot be mapped to a key
+            logger.warning(f"No last_aadhar checkpoint for request {request_id}, restarting search")
+            reset_parts(request_id)
+            last_index, part_count = 0, 0
 
-        if result:
-            if result[0] is not None:
-                last_index = result[0]
-            if result[1]:
-                try:
-                    files = json.loads(result[1])
-                except json.JSONDecodeError:
-                    files = []
+        logger.info(f"Resuming after aadhar: {last_aadhar}, last_processed_index: {last_index}, existing parts: {part_count}")
 
-        logger.info(f"Resuming from last_processed_index: {last_index}, existing files: {len(files)}")
+        # Compile validated criteria into a parameterized query; resume by key rather than
+        # by position, so skipped rows are never read again
+        query, params = to_pymysql(build_search_query(criteria, after_aadhar=last_aadhar))
 
         batch_size = BATCH_SIZE
-        file_index = (last_index // batch_size) + 1
-        has_more = True
+        file_index = part_count + 1
 
-        # Remove LIMIT and OFFSET from query, handle batching via fetchmany and cursor scroll
-        logger.debug(f"Executing query: {query} with params: {params}")
-        cursor.execute(query, params)
-        if last_index > 0:
-            try:
-                cursor.scroll(last_index, mode='absolute')
-            except Exception as e:
-                logger.warning(f"Unable to scroll to last_index {last_index}: {e}")
+        # Feed the index advisor once per search, and warn up front if the plan is a full scan
+        if last_aadhar is None:
+            record_criteria_usage(criteria)
+
+        # Serve an identical search from the cache while citizens is unchanged
+        key = fingerprint = None
+        if SEARCH_CACHE_ENABLED and last_aadhar is None:
+            with db_connection() as connection:
+                fingerprint = citizens_fingerprint(connection)
+            key = cache_key(criteria)
+            cached = search_cache.lookup(key, fingerprint)
+            if cached is not None:
+                link_parts(request_id, cached["source_request_id"], {
+                    "parts": cached["part_count"],
+                    "rows": cached["result_rows"],
+                    "bytes": cached["result_bytes"]
+                })
+                session = SessionLocal()
+                session.execute(
+                    update(request_tracker)
+                    .where(request_tracker.c.request_id == request_id)
+                    .values(status="completed")
+                )
+                session.commit()
+                session.close()
+                logger.info(f"search_jobs request {request_id} served from cache of {cached['source_request_id']}")
                 return
 
-        while has_more:
-            batch = cursor.fetchmany(batch_size)
-
-            if not batch:
-                has_more = False
-                continue
-
-            # Prepare response for this batch
-            response_data = {
-                "header": {
-                    "request_id": request_id,
-                    "request_type": "search",
-                    "tenant_id": tenant_id,
-                    "timestamp": datetime.datetime.now().isoformat(),
-                    "status": "completed",
-                    "part": file_index,
-                    "has_more_parts": True  # will be corrected after loop
-                },
-                "body": {
-                    "citizens": batch
-                }
-            }
+        # Filter the snapshot's column arrays instead of MySQL when it answers these criteria
+        # exactly; results are as of its last refresh and are not cached
+        snapshot = get_snapshot() if SEARCH_FROM_SNAPSHOT else None
+        predicate = compile_snapshot_criteria(criteria) if snapshot is not None else None
+
+        # Connect to the database; an unbuffered cursor streams rows instead of loading them all,
+        # and a connection that failed mid-stream is not reused
+        with db_connection() as connection:
+            if predicate is not None:
+                logger.info(f"Serving search request {request_id} from the citizen snapshot")
+                rows = snapshot.select(predicate, after_aadhar=last_aadhar, columns=SEARCH_RESULT_COLUMNS)
+                cursor = None
 
-            # Encrypt and save to file
-            from app.utils.common import encrypt_and_save_to_file
-            result_file = result_dir / f"{file_index}.json"
-            encrypt_and_save_to_file(response_data, result_file)
-            logger.info(f"Written result file: {result_file} with {len(batch)} records")
-
-            files.append(f"/results/{request_id}/{file_index}.json")
-            file_index += 1
-            last_index += len(batch)
-
-            # Update tracker with current list of files after every batch
-            session = SessionLocal()
-            session.execute(
-                update(request_tracker)
-                .where(request_tracker.c.request_id == request_id)
-                .values(
-                    last_processed_index=last_index,
-                    files=json.dumps(files)
+                def fetch_batch(size):
+                    return list(itertools.islice(rows, size))
+            else:
+                if SEARCH_EXPLAIN_ENABLED:
+                    warn_on_full_scan(connection, query, params)
+                cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+
+                # Batches are pulled from the server-side cursor with fetchmany
+                logger.debug(f"Executing query: {query} with params: {params}")
+                cursor.execute(query, params)
+                fetch_batch = cursor.fetchmany
+
+            def checkpoint(part, file_info):
+                """
+                Register a durable part and advance the checkpoint; called in part order by the pipeline.
+                """
+                check_lease(lease_lost)
+                record_part(
+                    request_id, part["part"], part["rows"], file_info, owner=owner,
+                    last_processed_index=part["last_index"],
+                    last_aadhar=part["last_aadhar"]
                 )
-            )
-            session.commit()
-            session.close()
-            logger.debug(f"Updated tracker with {len(files)} files and last_processed_index {last_index}")
+                logger.debug(f"Registered part {part['part']} with last_processed_index {part['last_index']}")
+
+            # Keep fetching while earlier parts are serialized, encrypted and written on the pool
+            with PartPipeline(SEARCH_PIPELINE_WORKERS, SEARCH_PIPELINE_DEPTH, checkpoint) as pipeline:
+                batch = fetch_batch(batch_size)
+                while batch:
+                    check_lease(lease_lost)
+                    # Look one batch ahead so each part is written once, already knowing if it is the last
+                    next_batch = fetch_batch(batch_size)
 
-        if files:
-            from app.utils.common import decrypt_file
-            response_path = result_dir / f"{file_index - 1}.json"
+                    # Prepare response for this batch
+                    response_data = {
+                        "header": {
+                            "request_id": request_id,
+                            "request_type": "search",
+                            "tenant_id": tenant_id,
+                            "timestamp": datetime.datetime.now().isoformat(),
+                            "status": "completed",
+                            "part": file_index,
+                            "has_more_parts": bool(next_batch)
+                        },
+                        "body": {
+                            "citizens": batch
+                        }
+                    }
 
-            # Decrypt the file first
-            decrypted_content = decrypt_file(response_path)
+                    last_index += len(batch)
+                    result_file = part_file_path(result_dir, file_index)
+                    pipeline.submit(response_data, result_file, {
+                        "part": file_index,
+                        "rows": len(batch),
+                        "last_index": last_index,
+                        "last_aadhar": batch[-1]["aadhar"]
+                    })
+                    logger.info(f"Queued result file: {result_file} with {len(batch)} records")
+                    file_index += 1
+                    batch = next_batch
 
-            # Update has_more_parts flag
-            decrypted_content["header"]["has_more_parts"] = False
+                pipeline.drain()
 
-            # Re-encrypt and save it again
-            from app.utils.common import encrypt_and_save_to_file
-            encrypt_and_save_to_file(decrypted_content, response_path)
+            if cursor is not None:
+                cursor.close()
 
-        cursor.close()
-        connection.close()
+            # Cache the result only if citizens did not change while it was being produced
+            if key is not None and predicate is None and citizens_fingerprint(connection) == fingerprint:
+                search_cache.store(key, fingerprint, request_id)
         
-        # Update tracker with completed status (files already updated in batching)
+        # Update tracker with completed status (parts already registered in batching)
         session = SessionLocal()
         session.execute(
             update(request_tracker)
@@ -494,6 +580,9 @@ async def process_search_request(request_data):
         
         logger.info(f"search_jobs request {request_id} processed successfully")
         
+    except LeaseLost as e:
+        # The worker that took over owns the tracker row now
+        logger.warning(f"Stopped search_jobs request {request_id}: {str(e)}")
     except Exception as e:
         logger.error(f"Error processing search_jobs request: {str(e)}")
         
@@ -503,8 +592,8 @@ async def process_search_request(request_data):
             update(request_tracker)
             .where(request_tracker.c.request_id == request_id)
             .values(
-                status="failed",
-                error=str(e)
+                status=failure_status(e),
+                error=str(e)[:255]
             )
         )
         session.commit()
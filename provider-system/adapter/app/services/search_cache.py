@@ -0,0 +1,116 @@
+"""
+Content-addressed cache of search results.
+
+A completed search is cached under a hash of its canonical criteria, projected columns
+and part size, together with a fingerprint of the citizens table. A later search with the
+same key is served by linking the cached parts into the part registry, as long as the
+fingerprint has not changed since.
+
+The fingerprint is the row count of ``citizens`` with its latest ``created_on`` and
+``updated_on``. It needs nothing on the write path of the business table (no triggers or
+counter rows that every writer would queue on). Reading it costs a COUNT(*) over the
+smallest citizens index, and the MAX lookups are index reads if ``created_on`` and
+``updated_on`` are indexed. Updates that do not maintain ``updated_on`` go unnoticed,
+which is why the cache is opt-in.
+"""
+import datetime
+import hashlib
+import json
+
+from sqlalchemy import delete, insert, select
+
+from app.core.config import BATCH_SIZE
+from app.db.models import SessionLocal, request_tracker, search_cache
+from app.services.search_query import SEARCH_RESULT_COLUMNS
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _canonical_criterion(criterion):
+    return {
+        "field": criterion["field"],
+        "operator": str(criterion["operator"]).strip().upper(),
+        "value": criterion["value"]
+    }
+
+
+def cache_key(criteria, columns=SEARCH_RESULT_COLUMNS, batch_size=BATCH_SIZE):
+    """
+    Hash of the canonical search definition. Criteria order and operator case do not matter.
+    """
+    canonical = sorted(
+        (_canonical_criterion(criterion) for criterion in criteria or []),
+        key=lambda criterion: json.dumps(criterion, sort_keys=True, default=str)
+    )
+    document = {"criteria": canonical, "columns": list(columns), "batch_size": batch_size}
+    return hashlib.sha256(json.dumps(document, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def citizens_fingerprint(connection):
+    """
+    Freshness marker of the citizens table: row count plus the latest created_on and
+    updated_on. Any insert or delete changes the count, and any update that maintains
+    updated_on moves its maximum.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) AS row_count, MAX(created_on) AS created_on, MAX(updated_on) AS updated_on "
+            "FROM citizens"
+        )
+        row = cursor.fetchone()
+    return f"{row['row_count']}:{row['created_on']}:{row['updated_on']}"
+
+
+def lookup(key, fingerprint):
+    """
+    Return the cache entry for ``key`` if it was built from the same citizens fingerprint.
+    """
+    session = SessionLocal()
+    try:
+        entry = session.execute(
+            select(search_cache).where(search_cache.c.cache_key == key)
+        ).mappings().first()
+    finally:
+        session.close()
+
+    if entry is None:
+        return None
+    if entry["fingerprint"] != fingerprint:
+        logger.info(f"Search cache entry {key[:12]} is stale")
+        return None
+    return entry
+
+
+def store(key, fingerprint, request_id):
+    """
+    Cache the completed search ``request_id`` under ``key``, replacing any older entry.
+    """
+    session = SessionLocal()
+    try:
+        summary = session.execute(
+            select(
+                request_tracker.c.part_count,
+                request_tracker.c.result_rows,
+                request_tracker.c.result_bytes
+            )
+            .where(request_tracker.c.request_id == request_id)
+        ).fetchone()
+        session.execute(delete(search_cache).where(search_cache.c.cache_key == key))
+        session.execute(
+            insert(search_cache).values(
+                cache_key=key,
+                source_request_id=request_id,
+                fingerprint=fingerprint,
+                part_count=summary.part_count or 0,
+                result_rows=summary.result_rows or 0,
+                result_bytes=summary.result_bytes or 0,
+                created_at=datetime.datetime.now()
+            )
+        )
+        session.commit()
+    finally:
+        session.close()
+    logger.info(f"Cached search request {request_id} under {key[:12]}")
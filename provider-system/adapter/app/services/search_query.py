@@ -0,0 +1,126 @@
+"""
+Criteria compiler for search requests.
+
+Search criteria are validated against the ``citizens`` Table metadata and compiled into
+parameterized SQLAlchemy Core expressions, so field names are never interpolated into SQL
+and values are always bound. Operators are emitted in index-friendly forms: single-value
+``IN`` becomes ``=``, ``LIKE`` is a prefix match and ``NEAR`` (``[value, tolerance]``)
+becomes a ``BETWEEN`` range instead of ``ABS(column - value) <= tolerance``.
+"""
+from sqlalchemy import and_, select
+from sqlalchemy.dialects import mysql
+
+from app.db.models import citizens
+from app.services.criteria import SUPPORTED_OPERATORS, InvalidCriteriaError
+
+
+SEARCH_OPERATORS = SUPPORTED_OPERATORS + ("LIKE", "NEAR")
+SEARCH_RESULT_COLUMNS = ("name", "aadhar", "phone_number")
+LIKE_ESCAPE = "/"
+EQUALITY_OPERATORS = ("=", "IN")
+RANGE_OPERATORS = (">", ">=", "<", "<=", "BETWEEN", "LIKE", "NEAR")
+
+_dialect = mysql.pymysql.dialect()
+
+
+def _pair(field, operator, value):
+    if not isinstance(value, (list, tuple)) or len(value) != 2:
+        raise InvalidCriteriaError(f"{operator} criterion on '{field}' needs a two element list value")
+    return value
+
+
+def compile_criterion(criterion):
+    """
+    Validate one ``field operator value`` criterion and return its Core expression.
+    """
+    try:
+        field = criterion["field"]
+        operator = str(criterion["operator"]).strip().upper()
+        value = criterion["value"]
+    except (KeyError, TypeError):
+        raise InvalidCriteriaError(f"Invalid criterion, expected field/operator/value: {criterion}")
+
+    if field not in citizens.c:
+        raise InvalidCriteriaError(f"Unknown search field '{field}'")
+    if operator not in SEARCH_OPERATORS:
+        raise InvalidCriteriaError(f"Unsupported operator '{criterion['operator']}' for field '{field}'")
+
+    column = citizens.c[field]
+    if operator == "=":
+        return column == value
+    if operator == "!=":
+        return column != value
+    if operator == ">":
+        return column > value
+    if operator == ">=":
+        return column >= value
+    if operator == "<":
+        return column < value
+    if operator == "<=":
+        return column <= value
+    if operator == "IN":
+        if not isinstance(value, (list, tuple)) or not value:
+            raise InvalidCriteriaError(f"IN criterion on '{field}' needs a non-empty list value")
+        return column == value[0] if len(value) == 1 else column.in_(list(value))
+    if operator == "BETWEEN":
+        low, high = _pair(field, operator, value)
+        return column.between(low, high)
+    if operator == "LIKE":
+        # Only prefix matches can use an index; wildcards in the value are matched literally
+        prefix = str(value).rstrip("%")
+        for char in (LIKE_ESCAPE, "%", "_"):
+            prefix = prefix.replace(char, LIKE_ESCAPE + char)
+        return column.like(f"{prefix}%", escape=LIKE_ESCAPE)
+
+    center, tolerance = _pair(field, operator, value)
+    try:
+        return column.between(center - tolerance, center + tolerance)
+    except TypeError:
+        raise InvalidCriteriaError(f"NEAR criterion on '{field}' needs numeric [value, tolerance]")
+
+
+def index_columns(criteria):
+    """
+    Composite index column order that serves a criteria list: equality columns first
+    (sorted, so equivalent searches share an index) followed by at most one range column.
+    Criteria that cannot use an index (``!=``) and the primary key are left out.
+    """
+    equality, ranges = set(), []
+    for criterion in criteria or []:
+        field = criterion.get("field")
+        operator = str(criterion.get("operator", "")).strip().upper()
+        if field not in citizens.c or field == "aadhar":
+            continue
+        if operator in EQUALITY_OPERATORS:
+            equality.add(field)
+        elif operator in RANGE_OPERATORS and field not in ranges:
+            ranges.append(field)
+
+    columns = sorted(equality)
+    ranges = [field for field in ranges if field not in equality]
+    return tuple(columns + ranges[:1])
+
+
+def build_search_query(criteria, after_aadhar=None, columns=SEARCH_RESULT_COLUMNS):
+    """
+    Compile a request's criteria into a keyset-ordered SELECT over citizens.
+    Rows resume strictly after ``after_aadhar`` when given.
+    """
+    conditions = [compile_criterion(criterion) for criterion in criteria or []]
+    if after_aadhar is not None:
+        conditions.append(citizens.c.aadhar > after_aadhar)
+
+    query = select(*(citizens.c[name] for name in columns))
+    if conditions:
+        query = query.where(and_(*conditions))
+    return query.order_by(citizens.c.aadhar)
+
+
+def to_pymysql(statement):
+    """
+    Render a Core statement to ``(sql, params)`` for a raw pymysql cursor.
+    Expanding IN parameters are rendered as individual placeholders.
+    """
+    compiled = statement.compile(dialect=_dialect, compile_kwargs={"render_postcompile": True})
+    params = [compiled.params[name] for name in compiled.positiontup]
+    return str(compiled), params
@@ -0,0 +1,66 @@
+"""
+Pool of request workers for one provider node.
+
+Each worker is a thread with its own event loop that keeps claiming requests from the
+job queue and processing them. When the queue is empty it waits on the dispatch channel,
+so a newly created request is picked up at once, and polls again after JOB_POLL_SECONDS.
+The first ``interactive_workers`` workers only take interactive requests, which keeps
+capacity free for small requests while bulk searches run.
+"""
+import threading
+
+from app.core.config import JOB_WORKERS, JOB_POLL_SECONDS, JOB_INTERACTIVE_WORKERS
+from app.services.dispatch import dispatcher
+from app.services.job_queue import INTERACTIVE_LANE, LANES, claim_next, run_claimed_blocking, worker_id
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class WorkerPool:
+    """
+    ``workers`` threads draining the request queue until ``stop`` is called.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, poll_seconds=JOB_POLL_SECONDS,
+                 interactive_workers=JOB_INTERACTIVE_WORKERS):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.interactive_workers = interactive_workers
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def start(self):
+        self.stopping.clear()
+        for number in range(self.workers):
+            lanes = (INTERACTIVE_LANE,) if number < self.interactive_workers else LANES
+            thread = threading.Thread(target=self._run, args=(lanes,), name=f"request-worker-{number}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        logger.info(f"Started {self.workers} request workers")
+
+    def stop(self, timeout=None):
+        """
+        Stop claiming new requests and wait for running ones to finish.
+        """
+        self.stopping.set()
+        dispatcher.wake_all()
+        for thread in self.threads:
+            thread.join(timeout)
+        self.threads = []
+        logger.info("Request workers stopped")
+
+    def _run(self, lanes):
+        owner = worker_id()
+        while not self.stopping.is_set():
+            try:
+                job = claim_next(owner, lanes)
+                if job is None:
+                    dispatcher.wait(self.poll_seconds)
+                    continue
+                run_claimed_blocking(job, owner)
+            except Exception as e:
+                logger.error(f"{owner} failed: {str(e)}")
+                self.stopping.wait(self.poll_seconds)
@@ -1,40 +1,88 @@
+import os
 import json
+import hashlib
 from app.utils.encryptor import Encryptor
 from app.utils.key_manager import KeyManager
-from app.core.config import ENCRYPTION_KEYS, CURRENT_KEY_ID
+from app.utils.part_format import (
+    BINARY_SUFFIX, JSON_SUFFIX, check_compression, is_binary_part, pack_part, unpack_part
+)
+from app.core.config import (
+    ENCRYPTION_KEYS, CURRENT_KEY_ID, PART_FORMAT, PART_COMPRESSION, PART_COMPRESSION_LEVEL
+)
 
 
 from app.core.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Refuse to start with a compression binary parts cannot be written with
+if PART_FORMAT == "binary":
+    check_compression(PART_COMPRESSION)
+
+
+def part_file_path(result_dir, part):
+    """
+    At-rest path of a result part in the configured PART_FORMAT.
+    """
+    suffix = BINARY_SUFFIX if PART_FORMAT == "binary" else JSON_SUFFIX
+    return result_dir / f"{part}{suffix}"
+
+def find_part_file(result_dir, part):
+    """
+    Locate a stored result part in either format, or return None.
+    """
+    for suffix in (BINARY_SUFFIX, JSON_SUFFIX):
+        file_path = result_dir / f"{part}{suffix}"
+        if file_path.exists():
+            return file_path
+    return None
 
 def encrypt_and_save_to_file(data, file_path):
     """
     Encrypts the given data and saves it to the specified file.
+    Paths ending in ``.part`` are written as compressed binary parts, others as JSON.
+    The file is written to a temporary path, fsynced and renamed into place,
+    so readers never see a partially written part.
+    Returns the written byte size and SHA-256 checksum.
     """
     key_manager = KeyManager(ENCRYPTION_KEYS, CURRENT_KEY_ID)
     encryptor = Encryptor(key_manager)
 
-    encrypted_data = encryptor.encrypt(data)
+    if str(file_path).endswith(BINARY_SUFFIX):
+        content = pack_part(data, encryptor, PART_COMPRESSION, PART_COMPRESSION_LEVEL)
+    else:
+        encrypted_data = encryptor.encrypt(data)
+        content = json.dumps(encrypted_data, indent=2).encode("utf-8")
 
-    with open(file_path, "w") as file:
-        json.dump(encrypted_data, file, indent=2)
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(content)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, file_path)
+
+    return {
+        "byte_size": len(content),
+        "checksum": hashlib.sha256(content).hexdigest()
+    }
 
 def decrypt_file(file_path):
     """
     Decrypts the contents of the given encrypted file and returns the original data.
-    Logs key selection based on file's embedded key_id.
+    Binary and JSON parts are told apart by their leading bytes.
     """
+    with open(file_path, "rb") as file:
+        content = file.read()
 
+    key_manager = KeyManager(ENCRYPTION_KEYS, CURRENT_KEY_ID)
+    encryptor = Encryptor(key_manager)
 
-    with open(file_path, "r") as file:
-        encrypted_data = json.load(file)
+    if is_binary_part(content):
+        logger.debug(f"Decrypting binary part: {file_path}")
+        return unpack_part(content, encryptor)
 
+    encrypted_data = json.loads(content)
     key_id = encrypted_data.get("key_id")
     logger.debug(f"Decrypting file: {file_path}, using key_id: {key_id}")
 
-    key_manager = KeyManager(ENCRYPTION_KEYS, CURRENT_KEY_ID)
-    encryptor = Encryptor(key_manager)
-
-    return encryptor.decrypt(encrypted_data)
\ No newline at end of file
+    return encryptor.decrypt(encrypted_data)
@@ -2,7 +2,7 @@
 import os
 import json
 import base64
-from typing import Union
+from typing import Tuple, Union
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from app.utils.key_manager import KeyManager
 
@@ -38,6 +38,21 @@ class Encryptor:
             }
             return payload
 
+    def encrypt_bytes(self, data_bytes: bytes, associated_data: bytes = None) -> Tuple[str, bytes, bytes]:
+        key = self.key_manager.get_current_key()
+        aesgcm = AESGCM(key)
+        nonce = os.urandom(12)
+        ciphertext = aesgcm.encrypt(nonce, data_bytes, associated_data)
+        return self.key_manager.get_current_key_id(), nonce, ciphertext
+
+    def decrypt_bytes(self, key_id: str, nonce: bytes, ciphertext: bytes, associated_data: bytes = None) -> bytes:
+        key = self.key_manager.get_key(key_id)
+        if not key:
+            raise ValueError(f"Unknown key_id {key_id}")
+
+        aesgcm = AESGCM(key)
+        return aesgcm.decrypt(nonce, ciphertext, associated_data)
+
     def decrypt(self, payload: Union[str, dict]) -> Union[str, dict, list]:
         if isinstance(payload, str):
             decoded = base64.b64decode(payload)
@@ -0,0 +1,70 @@
+"""
+Event loop lag monitor.
+
+A background task sleeps for LOOP_LAG_INTERVAL_SECONDS and measures how late it wakes up.
+The overshoot is the time the loop spent on something else without yielding, which is
+exactly the delay every other request on the API saw. Recent samples are kept so the
+``/metrics`` endpoint can report current, mean, p99 and max lag.
+"""
+import asyncio
+import collections
+import time
+
+from app.core.config import LOOP_LAG_INTERVAL_SECONDS, LOOP_LAG_WARN_MS
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+SAMPLE_WINDOW = 600
+
+
+class LoopLagMonitor:
+    """
+    Samples the lag of the running event loop until ``stop`` is called.
+    """
+
+    def __init__(self, interval=LOOP_LAG_INTERVAL_SECONDS, warn_ms=LOOP_LAG_WARN_MS, window=SAMPLE_WINDOW):
+        self.interval = interval
+        self.warn_ms = warn_ms
+        self.samples = collections.deque(maxlen=window)
+        self.max_ms = 0.0
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (time.perf_counter() - expected) * 1000)
+            self.samples.append(lag_ms)
+            self.max_ms = max(self.max_ms, lag_ms)
+            if self.warn_ms and lag_ms > self.warn_ms:
+                logger.warning(f"Event loop lag {lag_ms:.0f} ms exceeds {self.warn_ms} ms")
+
+    def stats(self):
+        """
+        Lag in milliseconds over the recent samples, plus the maximum since start.
+        """
+        if not self.samples:
+            return {"samples": 0, "current_ms": None, "mean_ms": None, "p99_ms": None, "max_ms": None}
+        ordered = sorted(self.samples)
+        return {
+            "samples": len(ordered),
+            "current_ms": round(self.samples[-1], 2),
+            "mean_ms": round(sum(ordered) / len(ordered), 2),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 2),
+            "max_ms": round(self.max_ms, 2)
+        }
+
+
+loop_monitor = LoopLagMonitor()
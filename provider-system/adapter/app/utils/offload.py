@@ -0,0 +1,40 @@
+"""
+Bounded executor for blocking work called from async request handlers.
+
+Database sessions, pymysql cursors, file I/O, AES-GCM and Keycloak lookups all block. Run
+them through ``run_blocking`` so the event loop keeps serving other requests meanwhile. At
+most BLOCKING_EXECUTOR_WORKERS calls run at once; further calls queue for a free thread.
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import BLOCKING_EXECUTOR_WORKERS
+
+
+executor = ThreadPoolExecutor(max_workers=BLOCKING_EXECUTOR_WORKERS, thread_name_prefix="blocking")
+
+_lock = threading.Lock()
+_pending = 0
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Await ``func(*args, **kwargs)`` running on the blocking executor.
+    """
+    global _pending
+    with _lock:
+        _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(func, *args, **kwargs))
+    finally:
+        with _lock:
+            _pending -= 1
+
+
+def stats():
+    """
+    Executor size and the blocking calls currently running or waiting for a thread.
+    """
+    return {"workers": BLOCKING_EXECUTOR_WORKERS, "pending": _pending}
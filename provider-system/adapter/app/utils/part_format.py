@@ -0,0 +1,100 @@
+"""
+Binary at-rest container for result parts.
+
+JSON parts store base64 ciphertext inside an indented JSON document. Binary parts
+compress the part JSON first (gzip or zstd), encrypt it with AES-GCM and store the raw
+bytes:
+
+    MAGIC | compression id (1 byte) | key_id length (1 byte) | key_id | nonce (12 bytes) | ciphertext
+
+The header is passed to AES-GCM as associated data, so it cannot be altered undetected.
+``check_compression`` rejects an unusable PART_COMPRESSION when the adapter starts rather
+than when its first binary part is written.
+"""
+import gzip
+import json
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+
+MAGIC = b"PRT1"
+NONCE_SIZE = 12
+BINARY_SUFFIX = ".part"
+JSON_SUFFIX = ".json"
+
+COMPRESSION_IDS = {"none": 0, "gzip": 1, "zstd": 2}
+COMPRESSION_NAMES = {value: name for name, value in COMPRESSION_IDS.items()}
+
+
+def check_compression(compression):
+    """
+    Raise ValueError if ``compression`` cannot be used to write binary parts here.
+    """
+    if compression not in COMPRESSION_IDS:
+        raise ValueError(
+            f"Unsupported PART_COMPRESSION '{compression}', expected one of: {', '.join(COMPRESSION_IDS)}"
+        )
+    if compression == "zstd" and zstandard is None:
+        raise ValueError("PART_COMPRESSION=zstd requires the zstandard package from requirements.txt")
+
+
+def compress(data_bytes, compression, level):
+    if compression == "gzip":
+        return gzip.compress(data_bytes, compresslevel=level, mtime=0)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("PART_COMPRESSION=zstd requires the zstandard package")
+        return zstandard.ZstdCompressor(level=level).compress(data_bytes)
+    if compression == "none":
+        return data_bytes
+    raise ValueError(f"Unsupported part compression '{compression}'")
+
+
+def decompress(data_bytes, compression):
+    if compression == "gzip":
+        return gzip.decompress(data_bytes)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("Reading zstd parts requires the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data_bytes)
+    return data_bytes
+
+
+def is_binary_part(content):
+    """
+    Sniff whether file content is a binary part rather than a JSON part.
+    """
+    return content[:len(MAGIC)] == MAGIC
+
+
+def pack_part(data, encryptor, compression, level):
+    """
+    Serialize, compress and encrypt a part into the binary container.
+    """
+    data_bytes = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    key_id = encryptor.key_manager.get_current_key_id().encode("utf-8")
+    header = MAGIC + bytes([COMPRESSION_IDS[compression], len(key_id)]) + key_id
+
+    _, nonce, ciphertext = encryptor.encrypt_bytes(compress(data_bytes, compression, level), header)
+    return header + nonce + ciphertext
+
+
+def unpack_part(content, encryptor):
+    """
+    Decrypt and decompress a binary part back into its JSON document.
+    """
+    if not is_binary_part(content):
+        raise ValueError("Not a binary result part")
+
+    compression_id, key_id_length = content[len(MAGIC)], content[len(MAGIC) + 1]
+    header_end = len(MAGIC) + 2 + key_id_length
+    header = content[:header_end]
+    key_id = content[len(MAGIC) + 2:header_end].decode("utf-8")
+    nonce = content[header_end:header_end + NONCE_SIZE]
+    ciphertext = content[header_end + NONCE_SIZE:]
+
+    compressed = encryptor.decrypt_bytes(key_id, nonce, ciphertext, header)
+    return json.loads(decompress(compressed, COMPRESSION_NAMES[compression_id]))
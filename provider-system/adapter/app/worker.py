@@ -0,0 +1,177 @@
+"""
+Standalone request worker for the Provider Adapter.
+
+``python -m app.worker`` starts a supervisor that runs WORKER_PROCESSES worker processes
+(one per core by default), each draining the request queue with its own WorkerPool. The
+supervisor restarts workers that crash, and workers that grow past WORKER_MAX_MEMORY_MB
+finish their running requests and exit so they are replaced by a fresh process.
+
+Run the API with JOB_WORKERS=0 and JOB_EXTERNAL_WORKERS=true when request processing is
+handled by this worker. The supervisor then receives the API's wake-up datagrams on
+WORKER_WAKE_PORT and passes them on to its worker processes.
+
+The memory limit counts private memory only, not shared file-backed pages such as the
+mmap'ed citizen snapshot. The name index, however, lives on each process's heap, so every
+worker builds and refreshes its own copy in a background thread (demographic matching
+uses SQL until it is ready): with NAME_INDEX_ENABLED, WORKER_MAX_MEMORY_MB must leave room
+for the index on top of the request working set, or workers recycle continuously.
+"""
+import argparse
+import ctypes
+import multiprocessing
+import os
+import resource
+import signal
+import threading
+
+from app.core.config import (
+    WORKER_PROCESSES, WORKER_THREADS, WORKER_MAX_MEMORY_MB, WORKER_RESTART_BACKOFF_SECONDS,
+    JOB_INTERACTIVE_WORKERS, NAME_INDEX_ENABLED, NAME_INDEX_REFRESH_MINUTES, WORKER_WAKE_PORT
+)
+
+
+from app.core.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+MEMORY_CHECK_SECONDS = 5
+RECYCLE_EXIT_CODE = 3
+
+
+def rss_mb():
+    """
+    Private resident memory of this process in MB: resident minus shared pages, so page
+    cache of mmap'ed files does not count (peak RSS where /proc is unavailable).
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            fields = statm.read().split()
+        return (int(fields[1]) - int(fields[2])) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def refresh_name_index_loop(stopping):
+    """
+    Build this process's name index, then refresh it every NAME_INDEX_REFRESH_MINUTES.
+    """
+    from app.scheduler.jobs.name_index_job import refresh_citizen_name_index
+
+    while True:
+        refresh_citizen_name_index()
+        if stopping.wait(NAME_INDEX_REFRESH_MINUTES * 60):
+            return
+
+
+def run_worker(threads, max_memory_mb, interactive_workers=0, wakeup=None):
+    """
+    Worker process body: drain the queue until asked to stop or recycled for memory.
+    ``wakeup`` is the supervisor's (condition, generation) pair for cross-process wake-ups.
+    """
+    # Imported here so each spawned process opens its own database engine
+    from app.services.dispatch import relay_wakeups
+    from app.services.worker_pool import WorkerPool
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+
+    if wakeup is not None:
+        threading.Thread(target=relay_wakeups, args=(*wakeup, stopping), name="wakeup-relay", daemon=True).start()
+
+    if NAME_INDEX_ENABLED:
+        threading.Thread(target=refresh_name_index_loop, args=(stopping,), name="name-index", daemon=True).start()
+
+    pool = WorkerPool(threads, interactive_workers=interactive_workers)
+    pool.start()
+    exit_code = 0
+    while not stopping.wait(MEMORY_CHECK_SECONDS):
+        if max_memory_mb and rss_mb() > max_memory_mb:
+            logger.warning(f"Worker {os.getpid()} uses {rss_mb():.0f} MB (limit {max_memory_mb} MB), recycling")
+            exit_code = RECYCLE_EXIT_CODE
+            break
+
+    # Running requests finish before the process exits
+    pool.stop()
+    raise SystemExit(exit_code)
+
+
+class Supervisor:
+    """
+    Keeps ``processes`` worker processes alive until stopped.
+    """
+
+    def __init__(self, processes=WORKER_PROCESSES, threads=WORKER_THREADS, max_memory_mb=WORKER_MAX_MEMORY_MB):
+        self.processes = processes
+        self.threads = threads
+        self.max_memory_mb = max_memory_mb
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = {}
+        self.stopping = threading.Event()
+        # Wake-ups received by this supervisor are broadcast to every worker process
+        self.wakeup = (self.context.Condition(), self.context.Value(ctypes.c_ulonglong, 0, lock=False))
+
+    def _spawn(self, slot):
+        # The first JOB_INTERACTIVE_WORKERS processes only take interactive requests,
+        # but at least one process always takes bulk requests
+        interactive_workers = self.threads if slot < min(JOB_INTERACTIVE_WORKERS, self.processes - 1) else 0
+        process = self.context.Process(
+            target=run_worker,
+            args=(self.threads, self.max_memory_mb, interactive_workers, self.wakeup if WORKER_WAKE_PORT else None),
+            name=f"provider-worker-{slot}"
+        )
+        process.start()
+        self.workers[slot] = process
+        logger.info(f"Started worker {slot} (pid {process.pid})")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, lambda *_: self.stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: self.stopping.set())
+
+        for slot in range(self.processes):
+            self._spawn(slot)
+
+        if WORKER_WAKE_PORT:
+            from app.services.dispatch import listen_for_wakeups
+            threading.Thread(
+                target=listen_for_wakeups, args=(WORKER_WAKE_PORT, *self.wakeup, self.stopping),
+                name="wakeup-listener", daemon=True
+            ).start()
+
+        while not self.stopping.wait(1):
+            for slot, process in list(self.workers.items()):
+                if process.is_alive():
+                    continue
+                if process.exitcode == RECYCLE_EXIT_CODE:
+                    logger.info(f"Worker {slot} (pid {process.pid}) recycled")
+                else:
+                    logger.error(f"Worker {slot} (pid {process.pid}) exited with {process.exitcode}, restarting")
+                    # Back off so a worker that crashes at startup does not spin
+                    if self.stopping.wait(WORKER_RESTART_BACKOFF_SECONDS):
+                        break
+                self._spawn(slot)
+
+        self.stop()
+
+    def stop(self, timeout=None):
+        """
+        Ask every worker to finish its running requests and wait for it to exit.
+        """
+        logger.info("Stopping workers")
+        for process in self.workers.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.workers.values():
+            process.join(timeout)
+        logger.info("All workers stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Provider request workers")
+    parser.add_argument("--processes", type=int, default=WORKER_PROCESSES)
+    parser.add_argument("--threads", type=int, default=WORKER_THREADS)
+    parser.add_argument("--max-memory-mb", type=int, default=WORKER_MAX_MEMORY_MB)
+    args = parser.parse_args()
+
+    Supervisor(args.processes, args.threads, args.max_memory_mb).run()
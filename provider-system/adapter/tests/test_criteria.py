@@ -0,0 +1,138 @@
+"""
+Column-array criteria evaluation gives the same results as per-row evaluation.
+"""
+import datetime
+import random
+import unittest
+
+import numpy as np
+
+from app.services.criteria import InvalidCriteriaError, compile_criteria
+
+
+NAMES = ["Ravi", "ravi", "RAVI", "Asha", "Élodie", "", None]
+LOCATIONS = ["Pune", "Delhi", "Chennai", "pune", None]
+DATES = [datetime.datetime(2024, 1, 1), datetime.datetime(2024, 6, 15, 12, 30), None]
+
+
+def random_rows(count, seed=7):
+    generator = random.Random(seed)
+    return [
+        {
+            "aadhar": f"{100000000000 + index}",
+            "name": generator.choice(NAMES),
+            "age": generator.choice([None, *range(15, 90)]),
+            "location": generator.choice(LOCATIONS),
+            "updated_on": generator.choice(DATES),
+        }
+        for index in range(count)
+    ]
+
+
+def to_columns(rows):
+    """
+    Encode rows the way the citizen snapshot stores them: UTF-8 bytes, -1 for a missing
+    age, NaT for a missing date, plus a null mask per column.
+    """
+    columns, nulls = {}, {}
+    for name in ("aadhar", "name", "location"):
+        columns[name] = np.array([(row[name] or "").encode("utf-8") for row in rows], dtype=bytes)
+        nulls[name] = np.array([row[name] is None for row in rows], dtype=bool)
+    columns["age"] = np.array([row["age"] if row["age"] is not None else -1 for row in rows], dtype=np.int32)
+    nulls["age"] = columns["age"] == -1
+    columns["updated_on"] = np.array(
+        [np.datetime64(row["updated_on"], "us") if row["updated_on"] else np.datetime64("NaT", "us") for row in rows],
+        dtype="datetime64[us]"
+    )
+    nulls["updated_on"] = np.isnat(columns["updated_on"])
+    return columns, nulls
+
+
+CRITERIA = [
+    {"field": "name", "operator": "=", "value": "RaVi"},
+    {"field": "name", "operator": "!=", "value": "ravi"},
+    {"field": "name", "operator": "IN", "value": ["asha", "élodie", None]},
+    {"field": "name", "operator": ">", "value": "B"},
+    {"field": "name", "operator": "BETWEEN", "value": ["A", "S"]},
+    {"field": "name", "operator": "=", "value": None},
+    {"field": "name", "operator": "!=", "value": None},
+    {"field": "name", "operator": "=", "value": 5},
+    {"field": "name", "operator": "<", "value": 5},
+    {"field": "location", "operator": "IN", "value": ["PUNE", "delhi"]},
+    {"field": "location", "operator": "<=", "value": "Delhi"},
+    {"field": "age", "operator": "=", "value": 60},
+    {"field": "age", "operator": "!=", "value": 60},
+    {"field": "age", "operator": ">", "value": 40},
+    {"field": "age", "operator": ">=", "value": 40.5},
+    {"field": "age", "operator": "<", "value": 30},
+    {"field": "age", "operator": "<=", "value": 30},
+    {"field": "age", "operator": "BETWEEN", "value": [20, 50]},
+    {"field": "age", "operator": "IN", "value": [18, 21, "60", None]},
+    {"field": "age", "operator": "=", "value": "60"},
+    {"field": "age", "operator": "!=", "value": "60"},
+    {"field": "age", "operator": ">", "value": "40"},
+    {"field": "age", "operator": "BETWEEN", "value": [20, "50"]},
+    {"field": "updated_on", "operator": "=", "value": "2024-01-01"},
+    {"field": "updated_on", "operator": "!=", "value": "2024-01-01"},
+    {"field": "updated_on", "operator": ">", "value": "2024-01-01"},
+    {"field": "unknown", "operator": "=", "value": 1},
+]
+
+
+class ColumnCriteriaTest(unittest.TestCase):
+
+    def assertColumnsMatchRows(self, criteria, rows):
+        predicate = compile_criteria(criteria)
+        columns, nulls = to_columns(rows)
+        self.assertEqual(predicate.evaluate_columns(columns, nulls), predicate.evaluate_rows(rows))
+
+    def test_every_operator_matches_per_row_results(self):
+        rows = random_rows(500)
+        for criterion in CRITERIA:
+            with self.subTest(criterion=criterion):
+                self.assertColumnsMatchRows([criterion], rows)
+
+    def test_whole_criteria_list(self):
+        self.assertColumnsMatchRows(CRITERIA, random_rows(200, seed=11))
+
+    def test_datetime_values(self):
+        cutoff = datetime.datetime(2024, 3, 1)
+        predicate = compile_criteria([
+            {"field": "updated_on", "operator": ">", "value": cutoff},
+            {"field": "updated_on", "operator": "=", "value": datetime.datetime(2024, 1, 1)},
+        ])
+        rows = random_rows(100, seed=3)
+        columns, nulls = to_columns(rows)
+        self.assertEqual(predicate.evaluate_columns(columns, nulls), predicate.evaluate_rows(rows))
+
+    def test_combined_mask_never_matches_missing_values(self):
+        rows = random_rows(300, seed=5)
+        columns, nulls = to_columns(rows)
+        criteria = [
+            {"field": "name", "operator": "!=", "value": "ravi"},
+            {"field": "age", "operator": ">=", "value": 30},
+        ]
+        predicate = compile_criteria(criteria)
+        expected = [
+            row["name"] is not None and row["age"] is not None and all(result["match"] for result in results)
+            for row, results in zip(rows, predicate.evaluate_rows(rows))
+        ]
+        self.assertEqual(predicate.mask(columns, len(rows), nulls).tolist(), expected)
+
+    def test_combined_mask_without_column(self):
+        predicate = compile_criteria([{"field": "unknown", "operator": "=", "value": 1}])
+        columns, nulls = to_columns(random_rows(10))
+        self.assertFalse(predicate.mask(columns, 10, nulls).any())
+
+    def test_empty_batch(self):
+        self.assertColumnsMatchRows(CRITERIA, [])
+
+    def test_invalid_criteria(self):
+        with self.assertRaises(InvalidCriteriaError):
+            compile_criteria([{"field": "age", "operator": "LIKE", "value": "6%"}])
+        with self.assertRaises(InvalidCriteriaError):
+            compile_criteria([{"field": "age", "operator": "BETWEEN", "value": [1]}])
+
+
+if __name__ == "__main__":
+    unittest.main()
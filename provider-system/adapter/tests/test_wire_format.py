@@ -0,0 +1,63 @@
+"""
+Round trips of result parts through every available wire format.
+"""
+import unittest
+
+from app.utils.wire_format import ARROW_FORMAT, SUPPORTED_FORMATS, decode_part, encode_part, format_available
+
+
+def verify_part(results):
+    return {
+        "header": {"request_id": "r1", "request_type": "verify", "part": 1, "has_more_parts": False},
+        "body": {"results": results}
+    }
+
+
+class WireFormatRoundTripTest(unittest.TestCase):
+
+    def assertRoundTrips(self, document):
+        for wire_format in SUPPORTED_FORMATS:
+            if not format_available(wire_format):
+                continue
+            with self.subTest(wire_format=wire_format):
+                self.assertEqual(decode_part(encode_part(document, wire_format), wire_format), document)
+
+    def test_mixed_row_shapes(self):
+        # Aadhar matches and demographic matches share a part but not their keys
+        self.assertRoundTrips(verify_part([
+            {"aadhar": "100000000001", "criteria_results": [{"field": "age", "match": True}], "match_score": 1.0},
+            {"name": "Ravi Kumar", "criteria_results": [], "match_score": 0.0},
+            {"aadhar": "100000000002", "criteria_results": [{"field": "age", "match": False}], "match_score": 1.0},
+        ]))
+
+    def test_mixed_value_types(self):
+        self.assertRoundTrips({
+            "header": {"request_id": "s1", "request_type": "search", "part": 1},
+            "body": {"citizens": [
+                {"aadhar": "100000000001", "age": 60, "phone_number": None},
+                {"aadhar": "100000000002", "age": "61", "phone_number": "9999999999"},
+                {"aadhar": "100000000003", "age": None},
+            ]}
+        })
+
+    def test_null_values_are_kept(self):
+        self.assertRoundTrips(verify_part([
+            {"aadhar": None, "criteria_results": [], "match_score": 0.0},
+            {"aadhar": "100000000001", "criteria_results": [], "match_score": 1.0},
+        ]))
+
+    def test_empty_part(self):
+        self.assertRoundTrips(verify_part([]))
+
+    @unittest.skipUnless(format_available(ARROW_FORMAT), "pyarrow is not installed")
+    def test_demographic_rows_have_no_aadhar_after_arrow(self):
+        document = verify_part([
+            {"aadhar": "100000000001", "match_score": 1.0},
+            {"name": "Ravi Kumar", "match_score": 0.0},
+        ])
+        rows = decode_part(encode_part(document, ARROW_FORMAT), ARROW_FORMAT)["body"]["results"]
+        self.assertNotIn("aadhar", rows[1])
+
+
+if __name__ == "__main__":
+    unittest.main()